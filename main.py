@@ -1,4 +1,32 @@
-from src.config.settings import BASE_DIR
+import argparse
+
+from src.pipelines.runner import run
+from src.pipelines.stages import STAGES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run pipeline stages whose inputs have changed."
+    )
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help="stages to bring up to date (default: all)",
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument(
+        "-f", "--force", action="store_true", help="ignore recorded hashes"
+    )
+    parser.add_argument(
+        "-l", "--list", action="store_true", help="list stages and exit"
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    print(BASE_DIR)
+    args = parse_args()
+    if args.list:
+        for stage in STAGES:
+            print(stage.name)
+    else:
+        run(args.targets, workers=args.workers, force=args.force)
@@ -0,0 +1,87 @@
+import csv
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+HANGUL_START = 0xAC00
+HANGUL_COUNT = 11172
+YEARS = range(1995, 2021)
+CATES = ["news", "논문"]
+
+
+def make_vocabulary(size=20000, seed=42):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        length = rng.choice([2, 2, 2, 3, 3, 4])
+        words.add(
+            "".join(
+                chr(HANGUL_START + rng.randrange(HANGUL_COUNT))
+                for _ in range(length)
+            )
+        )
+    return sorted(words)
+
+
+def iter_documents(
+    n_docs, vocabulary, words_per_doc=400, words_per_line=20, seed=42
+):
+    """
+    Yield ``[index, cate, year, title, context]`` rows of synthetic text.
+
+    Words follow a Zipf distribution over ``vocabulary`` so that keyword
+    and term frequencies look like a real corpus rather than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, len(vocabulary) + 1)
+    weights = 1 / ranks
+    weights /= weights.sum()
+    vocabulary = np.array(vocabulary)
+    for index in range(1, n_docs + 1):
+        n_words = max(words_per_line, int(rng.normal(words_per_doc, 80)))
+        words = vocabulary[rng.choice(len(vocabulary), n_words, p=weights)]
+        lines = [
+            " ".join(words[i : i + words_per_line])
+            for i in range(0, n_words, words_per_line)
+        ]
+        yield [
+            index,
+            CATES[rng.integers(len(CATES))],
+            int(rng.choice(YEARS)),
+            " ".join(words[:5]),
+            "\n".join(lines),
+        ]
+
+
+def write_corpus(path, n_docs, vocabulary, **kwargs):
+    with open(path, "w", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["index", "cate", "year", "title", "context"])
+        w.writerows(iter_documents(n_docs, vocabulary, **kwargs))
+
+
+def write_lexicons(path, vocabulary, n_axes=6, words_per_pole=40, seed=42):
+    """
+    Write keyword lexicons laid out the way ``morphs.get_data`` reads them:
+    one directory per axis holding two ``N. name.csv`` pole files with
+    ``형태소`` and ``가중치`` columns.
+    """
+    rng = random.Random(seed)
+    # skip the most frequent words so counts stay realistic
+    pool = vocabulary[len(vocabulary) // 100 :]
+    for axis in range(n_axes):
+        directory = os.path.join(path, f"{axis + 1:02d}")
+        os.makedirs(directory, exist_ok=True)
+        for pole in range(2):
+            words = rng.sample(pool, words_per_pole)
+            filename = f"{axis * 2 + pole + 1}. 축{axis + 1}-{pole}.csv"
+            pd.DataFrame(
+                {
+                    "형태소": words,
+                    "가중치": [
+                        round(rng.uniform(0.5, 2), 2) for _ in words
+                    ],
+                }
+            ).to_csv(os.path.join(directory, filename), index=False)
@@ -0,0 +1,324 @@
+import argparse
+import csv
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from src.benchmarks.corpus import (
+    iter_documents,
+    make_vocabulary,
+    write_lexicons,
+)
+from src.config.settings import OUTPUTS_DIR
+from src.corpus import reader
+from src.corpus.store import write_store
+from src.pipelines import instrument
+from src.preprocessing import cluster, similarity
+from src.preprocessing.td_idf import line_term_stats
+from src.vectors.pre import keyword_counts, morphs
+from src.vectors.pre.keyword_matcher import (
+    build_matcher,
+    count_keywords,
+    lexicon_keywords,
+)
+
+RESULTS_DIR = os.path.join(OUTPUTS_DIR, "benchmarks")
+DEFAULT_SIZES = [1000, 5000, 20000]
+EMBEDDING_DIM = 300
+N_CLUSTERS = 4
+CLUSTER_DOCS_HEADER = [
+    "index",
+    "cate",
+    "year",
+    "title",
+    "context",
+    "cluster",
+    "distance_from_cluster",
+]
+
+
+@contextmanager
+def outputs_dir(path):
+    """
+    Point the module-level output paths of the benchmarked stages at
+    ``path`` so a run never touches ``data/outputs``.
+    """
+    patches = [
+        (similarity, "OUTPUTS_DIR", path),
+        (morphs, "OUTPUTS_DIR", path),
+        (
+            keyword_counts,
+            "INDEX_RAW_PAPERS_STORE",
+            os.path.join(path, "raw"),
+        ),
+        (
+            keyword_counts,
+            "KEYWORD_COUNTS_PATH",
+            os.path.join(path, "keyword-counts.npz"),
+        ),
+        (instrument, "METRICS_DIR", os.path.join(path, "metrics")),
+    ]
+    saved = [
+        (module, name, getattr(module, name)) for module, name, _ in patches
+    ]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def synthetic_word_vectors(vocabulary, seed=42):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((len(vocabulary), EMBEDDING_DIM))
+    return SimpleNamespace(
+        vectors=vectors.astype(np.float32),
+        key_to_index={word: i for i, word in enumerate(vocabulary)},
+    )
+
+
+def write_cluster_docs(path, docs):
+    labels = np.random.default_rng(0).integers(0, N_CLUSTERS, len(docs))
+    with open(path, "w", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(CLUSTER_DOCS_HEADER)
+        for doc, label in zip(docs, labels):
+            w.writerow([*doc, label, 0.0])
+
+
+def keyword_count(docs, lexicons, workdir):
+    def run():
+        matcher = build_matcher(lexicon_keywords(lexicons))
+        for doc in docs:
+            count_keywords(matcher, doc[4])
+
+    return run
+
+
+def keyword_str_count(docs, lexicons, workdir):
+    """
+    The per-keyword ``str.count`` scan the matcher replaced, as a baseline.
+    """
+    keywords = list(dict.fromkeys(lexicon_keywords(lexicons)))
+
+    def run():
+        for doc in docs:
+            for keyword in keywords:
+                doc[4].count(keyword)
+
+    return run
+
+
+def tf_idf(docs, lexicons, workdir):
+    def run():
+        for doc in docs:
+            line_term_stats(doc[4].split("\n"))
+
+    return run
+
+
+def write_similarity(docs, lexicons, workdir):
+    write_cluster_docs(os.path.join(workdir, "cluster-docs.csv"), docs)
+
+    def run():
+        with outputs_dir(workdir):
+            similarity.write_similarity(with_raw=False)
+
+    return run
+
+
+def clustering(docs, lexicons, workdir, mini_batch=False):
+    tokens = [cluster.get_tokens(doc[4].replace("\n", " ")) for doc in docs]
+
+    def run():
+        matrix, _ = cluster.embed_documents(tokens)
+        if mini_batch:
+            kmeans = MiniBatchKMeans(n_clusters=N_CLUSTERS, random_state=42)
+            for start in range(0, len(matrix), 10000):
+                kmeans.partial_fit(matrix[start : start + 10000])
+            labels = kmeans.predict(matrix)
+        else:
+            kmeans = KMeans(n_clusters=N_CLUSTERS, random_state=42)
+            labels = kmeans.fit_predict(matrix)
+        cluster.centroid_distances(matrix, kmeans.cluster_centers_, labels)
+
+    return run
+
+
+def mini_batch_clustering(docs, lexicons, workdir):
+    return clustering(docs, lexicons, workdir, mini_batch=True)
+
+
+def future_vectors(docs, lexicons, workdir):
+    path = os.path.join(workdir, "cluster-docs.csv")
+    write_cluster_docs(path, docs)
+    write_store(os.path.join(workdir, "raw"), CLUSTER_DOCS_HEADER[:5], docs)
+    cluster_data = list(reader.iter_documents(path, morphs.CLUSTER_COLUMNS))
+
+    def run():
+        with outputs_dir(workdir):
+            if os.path.exists(keyword_counts.KEYWORD_COUNTS_PATH):
+                os.remove(keyword_counts.KEYWORD_COUNTS_PATH)
+            keyword_counts.write_keyword_counts(lexicons)
+            morphs.export_vectors(lexicons, cluster_data)
+            morphs.export_normalized_future_vectors(is_divide=True)
+            morphs.export_normalized_future_cluster_vectors()
+
+    return run
+
+
+CASES = {
+    "keyword_count": keyword_count,
+    "keyword_str_count": keyword_str_count,
+    "tf_idf": tf_idf,
+    "write_similarity": write_similarity,
+    "clustering": clustering,
+    "mini_batch_clustering": mini_batch_clustering,
+    "future_vectors": future_vectors,
+}
+
+
+def measure(func, memory=True):
+    """
+    Wall time of one call, then, on a second call, the peak of Python
+    allocations traced by ``tracemalloc``. The second call is kept apart
+    because tracing slows allocation-heavy code down considerably, and
+    worker processes of pooled stages are not traced.
+    """
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+        finally:
+            tracemalloc.stop()
+    return seconds, peak_mb
+
+
+def scaling_exponent(sizes, values):
+    """
+    Slope of ``values`` over ``sizes`` on a log-log scale: 1 is linear,
+    2 quadratic.
+    """
+    points = [(s, v) for s, v in zip(sizes, values) if v]
+    if len(points) < 2:
+        return None
+    x = np.log([s for s, _ in points])
+    y = np.log([v for _, v in points])
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def run(sizes=DEFAULT_SIZES, cases=None, memory=True, seed=42):
+    cases = cases or list(CASES)
+    vocabulary = make_vocabulary(seed=seed)
+    results = {name: [] for name in cases}
+    saved_vectors = cluster.word_vectors
+    cluster.word_vectors = synthetic_word_vectors(vocabulary, seed)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            lexicon_dir = os.path.join(root, "keywords")
+            write_lexicons(lexicon_dir, vocabulary, seed=seed)
+            lexicons = morphs.get_data(lexicon_dir)
+            for size in sizes:
+                docs = list(iter_documents(size, vocabulary, seed=seed))
+                for name in cases:
+                    workdir = os.path.join(root, f"{name}-{size}")
+                    os.makedirs(workdir)
+                    func = CASES[name](docs, lexicons, workdir)
+                    seconds, peak_mb = measure(func, memory)
+                    results[name].append(
+                        {
+                            "docs": size,
+                            "seconds": seconds,
+                            "peak_mb": peak_mb,
+                            "docs_per_second": size / seconds,
+                        }
+                    )
+                    print(
+                        f"{name:>22} {size:>8} docs {seconds:>9.3f}s"
+                        + (f" {peak_mb:>9.1f}MB" if memory else "")
+                    )
+    finally:
+        cluster.word_vectors = saved_vectors
+
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "sizes": list(sizes),
+        "cases": {
+            name: {
+                "runs": runs,
+                "time_exponent": scaling_exponent(
+                    sizes, [r["seconds"] for r in runs]
+                ),
+                "memory_exponent": scaling_exponent(
+                    sizes, [r["peak_mb"] for r in runs]
+                ),
+            }
+            for name, runs in results.items()
+        },
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print()
+    for name, case in report["cases"].items():
+        time_exponent = case["time_exponent"]
+        memory_exponent = case["memory_exponent"]
+        print(
+            f"{name:>22} time ~ n^{format_exponent(time_exponent)}"
+            f"  memory ~ n^{format_exponent(memory_exponent)}"
+        )
+    print(f"\nwrote {path}")
+    return report
+
+
+def format_exponent(value):
+    return "?" if value is None or math.isnan(value) else f"{value:.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline hot paths on synthetic corpora."
+    )
+    parser.add_argument(
+        "-n",
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="corpus sizes in documents",
+    )
+    parser.add_argument(
+        "-c", "--cases", nargs="+", choices=list(CASES), help="cases to run"
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip the traced second call that measures peak memory",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.cases, not args.no_memory, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import struct
+import zlib
+
+import numpy as np
+
+
+def hex_to_rgb(color):
+    color = color.lstrip("#")
+    return [int(color[i : i + 2], 16) for i in (0, 2, 4)]
+
+
+def data_range(values, padding=0.05):
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return -1.0, 1.0
+    low, high = float(values.min()), float(values.max())
+    span = high - low or 1.0
+    return low - span * padding, high + span * padding
+
+
+def aggregate(x, y, labels, n_labels, width, height, x_range, y_range):
+    """
+    Count the points of every label that fall into each pixel.
+
+    Returns an ``n_labels x height x width`` array; row 0 is the top of the
+    image. Points outside the ranges are dropped.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    labels = np.asarray(labels, dtype=np.int64)
+    col = np.floor((x - x_range[0]) / (x_range[1] - x_range[0]) * width)
+    row = np.floor((y_range[1] - y) / (y_range[1] - y_range[0]) * height)
+    inside = (
+        (col >= 0)
+        & (col < width)
+        & (row >= 0)
+        & (row < height)
+        & (labels >= 0)
+        & (labels < n_labels)
+    )
+    flat = (
+        labels[inside] * (width * height)
+        + row[inside].astype(np.int64) * width
+        + col[inside].astype(np.int64)
+    )
+    counts = np.bincount(flat, minlength=n_labels * width * height)
+    return counts.reshape(n_labels, height, width)
+
+
+def spread(counts, radius):
+    """
+    Grow every point into a ``(2 * radius + 1)`` pixel square: each pixel
+    gets the sum of the counts in the square around it.
+    """
+    if radius <= 0:
+        return counts
+    height, width = counts.shape[-2:]
+    padded = np.pad(counts, [(0, 0), (radius, radius), (radius, radius)])
+    # summed-area table, so the cost does not grow with the radius
+    table = padded.cumsum(axis=1).cumsum(axis=2)
+    table = np.pad(table, [(0, 0), (1, 0), (1, 0)])
+    size = 2 * radius + 1
+    return (
+        table[:, size : size + height, size : size + width]
+        - table[:, :height, size : size + width]
+        - table[:, size : size + height, :width]
+        + table[:, :height, :width]
+    )
+
+
+def shade(counts, colors, min_alpha=40, how="log"):
+    """
+    Composite per-label counts into one RGBA image.
+
+    Each pixel takes the count-weighted mean colour of the labels in it,
+    and its opacity grows with the total count (``log`` or ``linear``
+    scaling) from ``min_alpha`` to fully opaque; empty pixels stay clear.
+    """
+    colors = np.array([hex_to_rgb(c) for c in colors], dtype=float)
+    counts = counts.astype(float)
+    total = counts.sum(axis=0)
+    filled = total > 0
+    rgb = np.einsum("lhw,lc->hwc", counts, colors)
+    rgb[filled] /= total[filled, None]
+    scaled = np.log1p(total) if how == "log" else total
+    top = scaled.max() if filled.any() else 1.0
+    alpha = np.where(
+        filled, min_alpha + (255 - min_alpha) * scaled / (top or 1.0), 0
+    )
+    image = np.dstack([rgb, alpha])
+    return np.clip(np.round(image), 0, 255).astype(np.uint8)
+
+
+def write_png(path, image):
+    """
+    Write an ``height x width x 4`` uint8 RGBA array as a PNG file.
+    """
+    height, width = image.shape[:2]
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        body = kind + data
+        return (
+            struct.pack(">I", len(data))
+            + body
+            + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+        )
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        # 8 bits per channel, colour type 6 (RGBA), no interlacing
+        header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+        f.write(chunk(b"IHDR", header))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def scatter_png(
+    path,
+    x,
+    y,
+    labels,
+    colors,
+    width=1600,
+    height=1600,
+    x_range=None,
+    y_range=None,
+    radius=1,
+    min_alpha=40,
+    how="log",
+):
+    """
+    Rasterize a scatter plot straight to ``path`` without a browser.
+
+    ``labels`` are integer positions into ``colors`` (hex strings). Points
+    are binned per label into a pixel grid, spread by ``radius`` pixels and
+    composited by density, so the cost is linear in the number of points
+    and the file size depends only on the image size.
+    """
+    x_range = x_range or data_range(x)
+    y_range = y_range or data_range(y)
+    counts = aggregate(
+        x, y, labels, len(colors), width, height, x_range, y_range
+    )
+    write_png(path, shade(spread(counts, radius), colors, min_alpha, how))
@@ -6,3 +6,6 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 PAPERS_DIR = os.path.join(DATA_DIR, "converted_pdfs")
 OUTPUTS_DIR = os.path.join(DATA_DIR, "outputs")
 ABILITY_DIR = os.path.join(DATA_DIR, "ability")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+TOKEN_CACHE_PATH = os.path.join(CACHE_DIR, "tokens.sqlite3")
+TOKEN_CACHE_MAX_ENTRIES = 2_000_000
@@ -0,0 +1,231 @@
+import csv
+import multiprocessing
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from src.config.settings import OUTPUTS_DIR
+from src.corpus.store import (
+    NEWS_PAPERS_MERGED_STORE,
+    NEWS_PAPERS_STORE,
+    open_store,
+    write_store,
+)
+from src.pipelines.instrument import instrument, record
+
+DUPLICATES_PATH = os.path.join(OUTPUTS_DIR, "news-papers-duplicates.csv")
+DUPLICATES_HEADER = [
+    "cluster",
+    "index",
+    "kept_index",
+    "similarity",
+    "cate",
+    "year",
+    "title",
+]
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16
+THRESHOLD = 0.8
+# Buckets larger than this are verified against their first member only.
+MAX_BUCKET_PAIRS = 200
+MAX_HASH = np.uint64(0xFFFFFFFF)
+SHINGLE_CHUNK = 4096
+
+
+def permutations(num_perm=NUM_PERM, seed=1):
+    """
+    Parameters of ``num_perm`` multiply-shift hash functions
+    ``(a * x + b) >> 32`` over 64-bit words; ``a`` is odd.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    return a << np.uint64(1) | np.uint64(1), b
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """
+    32-bit hashes of the distinct character ``k``-grams of ``text``.
+
+    Whitespace is collapsed first, and the rolling polynomial hash runs over
+    the code point array in numpy, so no per-shingle Python objects exist.
+    """
+    text = re.sub(r"\s+", " ", text).strip()
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    if len(codes) < k:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for offset in range(k):
+            hashes *= np.uint64(1_000_003)
+            hashes += codes[offset : len(codes) - k + 1 + offset]
+        hashes ^= hashes >> np.uint64(32)
+    return np.unique(hashes & MAX_HASH)
+
+
+def minhash(hashes, a, b):
+    signature = np.full(len(a), MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), SHINGLE_CHUNK):
+        chunk = hashes[start : start + SHINGLE_CHUNK, None]
+        with np.errstate(over="ignore"):
+            values = (chunk * a + b) >> np.uint64(32)
+        np.minimum(signature, values.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def init_signature_worker(path, num_perm):
+    global worker_store, worker_permutations
+    worker_store = open_store(path)
+    worker_permutations = permutations(num_perm)
+
+
+def signature(key):
+    hashes = shingle_hashes(worker_store.text(key))
+    if not len(hashes):
+        return key, None
+    return key, minhash(hashes, *worker_permutations)
+
+
+def similar_pairs(signatures, bands=BANDS, threshold=THRESHOLD):
+    """
+    Yield ``(i, j, score)`` for rows of ``signatures`` that are similar.
+
+    The signature is cut into ``bands`` slices and only rows sharing a
+    slice are compared. A pair is kept when the share of equal MinHash
+    values, an estimate of the Jaccard similarity, reaches ``threshold``.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    checked = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = np.ascontiguousarray(
+            signatures[:, band * rows : (band + 1) * rows]
+        )
+        for i in range(n):
+            buckets[band_values[i].tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            members = np.array(members)
+            if len(members) > MAX_BUCKET_PAIRS:
+                left = np.zeros(len(members) - 1, dtype=np.int64)
+                right = np.arange(1, len(members))
+            else:
+                left, right = np.triu_indices(len(members), 1)
+            for i, j in zip(members[left], members[right]):
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                score = np.mean(signatures[i] == signatures[j])
+                if score >= threshold:
+                    yield int(i), int(j), float(score)
+
+
+def find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def duplicate_clusters(signatures, bands=BANDS, threshold=THRESHOLD):
+    """
+    Group rows of ``signatures`` that are transitively near-duplicates.
+
+    Returns lists of row positions, each sorted and holding at least two
+    rows, together with the best similarity seen for every grouped row.
+    """
+    parents = list(range(len(signatures)))
+    scores = {}
+    for i, j, score in similar_pairs(signatures, bands, threshold):
+        scores[i] = max(scores.get(i, 0), score)
+        scores[j] = max(scores.get(j, 0), score)
+        root_i, root_j = find(parents, i), find(parents, j)
+        if root_i != root_j:
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+    groups = defaultdict(list)
+    for i in scores:
+        groups[find(parents, i)].append(i)
+    return sorted(sorted(group) for group in groups.values()), scores
+
+
+@instrument
+def main(
+    processes=None, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD
+):
+    """
+    Drop near-duplicate documents from the merged news and papers corpus.
+
+    Each document gets a MinHash signature of its character shingles in a
+    process pool, LSH banding proposes candidate pairs in roughly linear
+    time, and candidates are verified on their signatures. Of every
+    duplicate cluster the document with the lowest index is kept; the
+    clusters are listed in ``news-papers-duplicates.csv`` and the remaining
+    documents are written, renumbered from 1, to the news-papers store.
+    """
+    merged = open_store(NEWS_PAPERS_MERGED_STORE)
+    keys = list(merged.keys())
+    signatures = {}
+    with multiprocessing.Pool(
+        processes,
+        initializer=init_signature_worker,
+        initargs=(NEWS_PAPERS_MERGED_STORE, num_perm),
+    ) as pool:
+        for key, sig in pool.imap(signature, keys, chunksize=64):
+            if sig is not None:
+                signatures[key] = sig
+    hashed = sorted(signatures)
+    clusters, scores = duplicate_clusters(
+        np.array([signatures[key] for key in hashed]).reshape(-1, num_perm),
+        bands,
+        threshold,
+    )
+
+    dropped = set()
+    with open(DUPLICATES_PATH, "w", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(DUPLICATES_HEADER)
+        for number, group in enumerate(clusters, 1):
+            kept = hashed[group[0]]
+            for position in group:
+                key = hashed[position]
+                if key != kept:
+                    dropped.add(key)
+                doc = merged[key]
+                w.writerow(
+                    [
+                        number,
+                        key,
+                        kept,
+                        round(scores[position], 4),
+                        doc.cate,
+                        doc.year,
+                        doc.title,
+                    ]
+                )
+
+    def rows():
+        index = 1
+        for key in keys:
+            if key in dropped:
+                continue
+            row = list(merged[key])
+            row[merged.columns.index("index")] = index
+            index += 1
+            yield row
+
+    write_store(NEWS_PAPERS_STORE, merged.columns, rows())
+    record(rows_in=len(keys), rows_out=len(keys) - len(dropped))
+    print(
+        f"{len(clusters)} duplicate clusters, "
+        f"{len(dropped)} of {len(keys)} documents dropped"
+    )
+    merged.close()
+
+
+if __name__ == "__main__":
+    main()
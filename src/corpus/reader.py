@@ -0,0 +1,49 @@
+import csv
+import sys
+from collections import namedtuple
+
+csv.field_size_limit(sys.maxsize)
+
+DOCUMENT_COLUMNS = ["index", "cate", "year", "title", "context"]
+DOCUMENT_CONVERTERS = {"index": int}
+
+
+def read_header(path, encoding="utf-8"):
+    with open(path, encoding=encoding, newline="") as f:
+        return next(csv.reader(f))
+
+
+def iter_rows(path, skip_header=True, encoding="utf-8"):
+    with open(path, encoding=encoding, newline="") as f:
+        reader = csv.reader(f)
+        if skip_header:
+            next(reader, None)
+        yield from reader
+
+
+def iter_records(path, columns=None, converters=None, encoding="utf-8"):
+    """
+    Lazily yield one namedtuple per CSV row.
+
+    ``columns`` selects and orders the fields to keep, so a stage that does
+    not need ``context`` never holds more than the current row's text.
+    ``converters`` maps column names to callables applied to the raw value.
+    """
+    with open(path, encoding=encoding, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = columns or header
+        positions = [header.index(column) for column in columns]
+        record = namedtuple("Record", columns, rename=True)
+        converters = converters or {}
+        casts = [converters.get(column) for column in columns]
+        for row in reader:
+            values = []
+            for position, cast in zip(positions, casts):
+                value = row[position]
+                values.append(cast(value) if cast else value)
+            yield record(*values)
+
+
+def iter_documents(path, columns=None, encoding="utf-8"):
+    return iter_records(path, columns, DOCUMENT_CONVERTERS, encoding)
@@ -0,0 +1,152 @@
+import csv
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from src.config.settings import OUTPUTS_DIR
+
+NEWS_PAPERS_MERGED_STORE = os.path.join(OUTPUTS_DIR, "news-papers-merged")
+NEWS_PAPERS_STORE = os.path.join(OUTPUTS_DIR, "news-papers")
+INDEX_RAW_PAPERS_STORE = os.path.join(OUTPUTS_DIR, "index-raw-papers")
+
+MAGIC = b"DOCSTORE1\n"
+INDEX_MAGIC = b"DOCIDX01"
+INDEX_HEADER = struct.Struct("<8sQ")
+ENTRY = struct.Struct("<QII")
+MISSING = 0xFFFFFFFF
+
+
+def write_store(path, columns, rows, text_column="context"):
+    """
+    Write ``rows`` to ``path.docs`` and a dense offset table to ``path.idx``.
+
+    Every row is stored as its JSON-encoded metadata followed by the raw
+    UTF-8 text, and the index maps the integer ``index`` column straight to
+    that byte range, so readers seek to document N without parsing others.
+    Files are written to temporaries and swapped in atomically.
+    """
+    text_at = columns.index(text_column)
+    key_at = columns.index("index")
+    header = json.dumps(
+        {"columns": columns, "text_column": text_column}, ensure_ascii=False
+    ).encode("utf-8")
+    entries = {}
+    with open(f"{path}.docs.tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(header + b"\n")
+        for row in rows:
+            row = list(row)
+            text = row.pop(text_at).encode("utf-8")
+            row[key_at] = int(row[key_at])
+            meta = json.dumps(row, ensure_ascii=False).encode("utf-8")
+            entries[row[key_at]] = (f.tell(), len(meta), len(text))
+            f.write(meta)
+            f.write(text)
+    size = max(entries, default=-1) + 1
+    with open(f"{path}.idx.tmp", "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, size))
+        for key in range(size):
+            f.write(ENTRY.pack(*entries.get(key, (0, MISSING, 0))))
+    os.replace(f"{path}.docs.tmp", f"{path}.docs")
+    os.replace(f"{path}.idx.tmp", f"{path}.idx")
+
+
+def write_store_from_csv(path, csv_path):
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        write_store(path, next(reader), reader)
+
+
+class DocumentStore:
+    def __init__(self, path):
+        self.path = path
+        with open(f"{path}.docs", "rb") as f:
+            self.docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(f"{path}.idx", "rb") as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = INDEX_HEADER.unpack_from(self.index)
+        if magic != INDEX_MAGIC or self.docs[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a document store")
+        end = self.docs.find(b"\n", len(MAGIC))
+        header = json.loads(self.docs[len(MAGIC) : end].decode("utf-8"))
+        self.columns = header["columns"]
+        self.text_column = header["text_column"]
+        self.meta_columns = [
+            c for c in self.columns if c != self.text_column
+        ]
+        self.record = namedtuple("Record", self.columns, rename=True)
+        self.text_at = self.columns.index(self.text_column)
+
+    def entry(self, key):
+        key = int(key)
+        if not 0 <= key < self.size:
+            raise KeyError(key)
+        offset, meta_len, text_len = ENTRY.unpack_from(
+            self.index, INDEX_HEADER.size + key * ENTRY.size
+        )
+        if meta_len == MISSING:
+            raise KeyError(key)
+        return offset, meta_len, text_len
+
+    def meta(self, key):
+        offset, meta_len, _ = self.entry(key)
+        return json.loads(self.docs[offset : offset + meta_len])
+
+    def text(self, key):
+        offset, meta_len, text_len = self.entry(key)
+        start = offset + meta_len
+        return self.docs[start : start + text_len].decode("utf-8")
+
+    def __getitem__(self, key):
+        row = self.meta(key)
+        row.insert(self.text_at, self.text(key))
+        return self.record(*row)
+
+    def __contains__(self, key):
+        try:
+            self.entry(key)
+        except KeyError:
+            return False
+        return True
+
+    def keys(self):
+        return (key for key in range(self.size) if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+    def iter_documents(self, columns=None):
+        columns = columns or self.columns
+        record = namedtuple("Record", columns, rename=True)
+        positions = [self.columns.index(column) for column in columns]
+        with_text = self.text_column in columns
+        for key in self.keys():
+            row = self.meta(key)
+            if with_text:
+                row.insert(self.text_at, self.text(key))
+            else:
+                row.insert(self.text_at, None)
+            yield record(*[row[position] for position in positions])
+
+    def to_csv(self, csv_path):
+        with open(csv_path, "w", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(self.columns)
+            for key in self.keys():
+                w.writerow(self[key])
+
+    def close(self):
+        self.docs.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_store(path):
+    return DocumentStore(path)
@@ -1,25 +1,24 @@
-import csv
 import os
-import sys
+from itertools import chain
 
 from src.config.settings import DATA_DIR, OUTPUTS_DIR
+from src.corpus.reader import iter_rows, read_header
+from src.corpus.store import NEWS_PAPERS_MERGED_STORE, write_store
+from src.pipelines.instrument import instrument, record
 
-csv.field_size_limit(sys.maxsize)
+NEWS_PATH = os.path.join(DATA_DIR, "scrapy", "no-dep-news-content.csv")
+PAPERS_PATH = os.path.join(OUTPUTS_DIR, "index-papers.csv")
 
 
+@instrument
 def main():
-    with open(
-        os.path.join(DATA_DIR, "scrapy", "no-dep-news-content.csv")
-    ) as f:
-        news = list(csv.reader(f))
-    with open(os.path.join(OUTPUTS_DIR, "index-papers.csv")) as f:
-        papers = list(csv.reader(f))
-    ret = [news[0]]
-    for idx, row in enumerate(news[1:] + papers[1:], 1):
-        ret.append([idx, *row[1:]])
-    with open(os.path.join(OUTPUTS_DIR, "news-papers.csv"), "w") as f:
-        writer = csv.writer(f)
-        writer.writerows(ret)
+    def rows():
+        merged = chain(iter_rows(NEWS_PATH), iter_rows(PAPERS_PATH))
+        for idx, row in enumerate(merged, 1):
+            record(rows_in=1, rows_out=1)
+            yield [idx, *row[1:]]
+
+    write_store(NEWS_PAPERS_MERGED_STORE, read_header(NEWS_PATH), rows())
 
 
 if __name__ == "__main__":
@@ -1,33 +1,138 @@
+import json
+import multiprocessing
 import os
+import shutil
 import subprocess
-import re
-from src.config.settings import DATA_DIR
-
-
-def main():
-    years = os.listdir(os.path.join(DATA_DIR, "pdfs"))
-    for year in years:
-        files = os.listdir(os.path.join(DATA_DIR, "pdfs", year))
-        output_year_dir = os.path.join(DATA_DIR, "converted_pdfs", year)
-        if not os.path.isdir(output_year_dir):
-            os.mkdir(output_year_dir)
-        for file in files:
-            filepath = os.path.join(DATA_DIR, "pdfs", year, file)
-            output_path = os.path.join(output_year_dir, file)
-            print(f"ocrmypdf {filepath} {output_path}")
-            output = subprocess.getoutput(f"ocrmypdf {filepath} {output_path}")
-            if not re.search(
-                "PriorOcrFoundError: page already has text!", output
-            ):
-                print(filepath, output_year_dir, "mv")
-                mv_output = subprocess.getoutput(
-                    f"mv '{filepath}' {output_year_dir}"
-                )
-                print(mv_output)
-
-                print("Uploaded scanned pdf")
-            else:
-                print("Uploaded digital pdf")
+import time
+from multiprocessing.pool import ThreadPool
+
+import pdftotext
+
+from src.config.settings import CACHE_DIR, DATA_DIR, PAPERS_DIR
+
+PDFS_DIR = os.path.join(DATA_DIR, "pdfs")
+OCR_TMP_DIR = os.path.join(CACHE_DIR, "ocr")
+OCR_LOG_PATH = os.path.join(CACHE_DIR, "ocr-jobs.jsonl")
+# ocrmypdf exits with 6 when a page already has text
+ALREADY_DONE_OCR = 6
+DONE = {"digital", "ocr"}
+
+
+def iter_jobs():
+    for year in sorted(os.listdir(PDFS_DIR)):
+        for file in sorted(os.listdir(os.path.join(PDFS_DIR, year))):
+            yield os.path.join(year, file)
+
+
+def has_text_layer(path):
+    try:
+        with open(path, "rb") as f:
+            return any(page.strip() for page in pdftotext.PDF(f))
+    except pdftotext.Error:
+        return False
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def load_log(path=OCR_LOG_PATH):
+    """
+    Latest entry per job; entries are appended, so later lines win.
+    """
+    jobs = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by an interrupted run
+                    continue
+                jobs[entry["job"]] = entry
+    except FileNotFoundError:
+        pass
+    return jobs
+
+
+def is_done(job, entry):
+    if entry is None or entry["status"] not in DONE:
+        return False
+    current = fingerprint(os.path.join(PDFS_DIR, job))
+    return (
+        entry["size"] == current["size"]
+        and entry["mtime"] == current["mtime"]
+        and os.path.exists(os.path.join(PAPERS_DIR, job))
+    )
+
+
+def run_job(job, jobs_per_file=1):
+    """
+    Put a text-bearing copy of ``job`` under PAPERS_DIR.
+
+    PDFs that already have a text layer are copied as they are; only the
+    others go through ocrmypdf. The result is written to OCR_TMP_DIR first
+    and moved into place once complete, so PAPERS_DIR never holds a
+    partial file.
+    """
+    source = os.path.join(PDFS_DIR, job)
+    target = os.path.join(PAPERS_DIR, job)
+    tmp = os.path.join(OCR_TMP_DIR, job.replace(os.sep, "-"))
+    entry = {"job": job, **fingerprint(source), "returncode": None}
+    started = time.perf_counter()
+    if has_text_layer(source):
+        shutil.copy2(source, tmp)
+        entry["status"] = "digital"
+    else:
+        process = subprocess.run(
+            ["ocrmypdf", "--jobs", str(jobs_per_file), source, tmp],
+            capture_output=True,
+            text=True,
+        )
+        entry["returncode"] = process.returncode
+        if process.returncode == 0:
+            entry["status"] = "ocr"
+        elif process.returncode == ALREADY_DONE_OCR:
+            shutil.copy2(source, tmp)
+            entry["status"] = "digital"
+        else:
+            entry["status"] = "failed"
+            entry["error"] = process.stderr[-2000:]
+    if entry["status"] in DONE:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp, target)
+    elif os.path.exists(tmp):
+        os.remove(tmp)
+    entry["seconds"] = time.perf_counter() - started
+    return entry
+
+
+def main(workers=None, jobs_per_file=1):
+    """
+    OCR every PDF under data/pdfs into PAPERS_DIR on ``workers`` concurrent
+    jobs, resuming from the job log.
+
+    Every finished job is appended to OCR_LOG_PATH right away, so an
+    interrupted batch skips whatever completed. Failed jobs are retried on
+    the next run, as are sources whose size or mtime changed.
+    """
+    os.makedirs(OCR_TMP_DIR, exist_ok=True)
+    log = load_log()
+    jobs = [job for job in iter_jobs() if not is_done(job, log.get(job))]
+    print(f"{len(jobs)} pdfs to convert, {len(log)} in the job log")
+    if not jobs:
+        return
+    workers = workers or multiprocessing.cpu_count()
+    with open(OCR_LOG_PATH, "a", encoding="utf-8") as f, ThreadPool(
+        workers
+    ) as pool:
+        for entry in pool.imap_unordered(
+            lambda job: run_job(job, jobs_per_file), jobs
+        ):
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            print(entry["job"], entry["status"], f"{entry['seconds']:.1f}s")
 
 
 if __name__ == "__main__":
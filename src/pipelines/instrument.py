@@ -0,0 +1,128 @@
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+from src.config.settings import OUTPUTS_DIR
+
+METRICS_DIR = os.path.join(OUTPUTS_DIR, "metrics")
+PROFILE_ENV = "PIPELINE_PROFILE"
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+
+active = []
+
+
+def run_id():
+    if RUN_ID_ENV not in os.environ:
+        started = datetime.now().strftime("%Y%m%dT%H%M%S")
+        os.environ[RUN_ID_ENV] = f"{started}-{os.getpid()}"
+    return os.environ[RUN_ID_ENV]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes everywhere else
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        own.ru_utime + own.ru_stime,
+        children.ru_utime + children.ru_stime,
+    )
+
+
+def record(rows_in=0, rows_out=0):
+    """
+    Add row counts to the innermost running stage, if any.
+    """
+    if active:
+        active[-1]["rows_in"] += rows_in
+        active[-1]["rows_out"] += rows_out
+
+
+def emit(metrics):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{metrics['run_id']}.jsonl")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(metrics, ensure_ascii=False) + "\n")
+
+
+def instrument(func):
+    """
+    Report wall time, CPU time, peak RSS and row throughput of a stage.
+
+    ``ru_maxrss`` only ever grows over the life of a process, so the
+    ``process_peak_rss_mb`` fields are high-water marks since the process
+    started, while ``peak_rss_growth_mb`` is how far this stage raised
+    that mark; it is 0 for a stage that stayed below an earlier peak.
+    One JSON line per call is appended to ``metrics/<run id>.jsonl``; all
+    processes of a pipeline run share the id through ``PIPELINE_RUN_ID``.
+    Setting ``PIPELINE_PROFILE=1`` also writes a cProfile dump per call.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = {
+            "run_id": run_id(),
+            "stage": name,
+            "pid": os.getpid(),
+            "started_at": datetime.now().isoformat(),
+            "rows_in": 0,
+            "rows_out": 0,
+        }
+        profiler = cProfile.Profile() if os.environ.get(PROFILE_ENV) else None
+        active.append(metrics)
+        own_cpu, children_cpu = cpu_seconds()
+        peak_before = peak_rss_mb()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            if profiler:
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            wall = time.perf_counter() - started
+            own_after, children_after = cpu_seconds()
+            peak_after = peak_rss_mb()
+            active.pop()
+            metrics.update(
+                {
+                    "status": status,
+                    "wall_seconds": wall,
+                    "cpu_seconds": own_after - own_cpu,
+                    "children_cpu_seconds": children_after - children_cpu,
+                    "process_peak_rss_mb": peak_after,
+                    "peak_rss_growth_mb": peak_after - peak_before,
+                    "children_process_peak_rss_mb": peak_rss_mb(
+                        resource.RUSAGE_CHILDREN
+                    ),
+                    "rows_in_per_second": metrics["rows_in"] / wall
+                    if wall
+                    else None,
+                    "rows_out_per_second": metrics["rows_out"] / wall
+                    if wall
+                    else None,
+                }
+            )
+            if profiler:
+                profile_path = os.path.join(
+                    METRICS_DIR,
+                    f"{metrics['run_id']}-{name}-{os.getpid()}.prof",
+                )
+                os.makedirs(METRICS_DIR, exist_ok=True)
+                profiler.dump_stats(profile_path)
+                metrics["profile"] = profile_path
+            emit(metrics)
+
+    return wrapper
@@ -0,0 +1,171 @@
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+from multiprocessing import connection
+
+from src.config.settings import OUTPUTS_DIR
+from src.pipelines.instrument import run_id
+from src.pipelines.stages import STAGES
+from src.utils.files import hash_file
+
+STATE_PATH = os.path.join(OUTPUTS_DIR, ".pipeline-state.json")
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"stages": {}, "files": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def hash_path(path, files):
+    """
+    Content hash of a file or, recursively, of a directory.
+
+    Hashes are memoized in ``files`` by size and mtime, so unchanged files
+    are not re-read on every run.
+    """
+    if not os.path.exists(path):
+        return None
+    if not os.path.isdir(path):
+        return hash_file(path, files)
+    digest = hashlib.sha1()
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            filepath = os.path.join(root, name)
+            digest.update(os.path.relpath(filepath, path).encode("utf-8"))
+            digest.update(hash_file(filepath, files).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def hash_paths(paths, files):
+    return {path: hash_path(path, files) for path in paths}
+
+
+def dependencies(stages):
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            producers[path] = stage.name
+    return {
+        stage.name: {
+            producers[path]
+            for path in stage.inputs
+            if path in producers and producers[path] != stage.name
+        }
+        for stage in stages
+    }
+
+
+def select(stages, targets):
+    if not targets:
+        return stages
+    by_name = {stage.name: stage for stage in stages}
+    deps = dependencies(stages)
+    wanted = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise KeyError(f"unknown stage: {name}")
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def call_stage(target, kwargs):
+    module, function = target.split(":")
+    getattr(importlib.import_module(module), function)(**kwargs)
+
+
+def start_stage(stage):
+    # A separate, non-daemonic process per stage: stages may start their
+    # own multiprocessing pools and must not share interpreter state.
+    process = multiprocessing.Process(
+        target=call_stage, args=(stage.target, stage.kwargs), name=stage.name
+    )
+    process.start()
+    return process
+
+
+def is_fresh(stage, inputs, state):
+    recorded = state["stages"].get(stage.name)
+    if not recorded or recorded["inputs"] != inputs:
+        return False
+    outputs = hash_paths(stage.outputs, state["files"])
+    return None not in outputs.values() and recorded["outputs"] == outputs
+
+
+def run(targets=None, workers=None, force=False, stages=STAGES):
+    """
+    Run ``targets`` and everything they depend on, in dependency order.
+
+    A stage is skipped when the content hashes of its inputs match the last
+    successful run and its outputs are unchanged. Stages whose dependencies
+    are satisfied run concurrently on up to ``workers`` processes.
+    """
+    stages = select(stages, targets)
+    deps = dependencies(stages)
+    state = load_state()
+    done = set()
+    running = {}
+    remaining = {stage.name: stage for stage in stages}
+    workers = workers or multiprocessing.cpu_count()
+    # Forked stage processes inherit the id, so a run's metrics share a file.
+    print(f"run id {run_id()}")
+
+    try:
+        while remaining or running:
+            ready = [
+                stage
+                for name, stage in remaining.items()
+                if deps[name] <= done
+            ]
+            for stage in ready:
+                if len(running) >= workers:
+                    break
+                del remaining[stage.name]
+                inputs = hash_paths(stage.inputs, state["files"])
+                if not force and is_fresh(stage, inputs, state):
+                    print(f"skip {stage.name}")
+                    done.add(stage.name)
+                    continue
+                print(f"run {stage.name}")
+                process = start_stage(stage)
+                running[process.sentinel] = (stage, inputs, process)
+            if not running:
+                if remaining and not ready:
+                    raise RuntimeError(
+                        f"unsatisfiable stages: {sorted(remaining)}"
+                    )
+                continue
+            for sentinel in connection.wait(list(running)):
+                stage, inputs, process = running.pop(sentinel)
+                process.join()
+                if process.exitcode != 0:
+                    raise RuntimeError(
+                        f"stage {stage.name} failed with exit code "
+                        f"{process.exitcode}"
+                    )
+                state["stages"][stage.name] = {
+                    "inputs": inputs,
+                    "outputs": hash_paths(stage.outputs, state["files"]),
+                }
+                save_state(state)
+                done.add(stage.name)
+    finally:
+        for _, _, process in running.values():
+            process.join()
+    return done
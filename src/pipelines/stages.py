@@ -0,0 +1,221 @@
+import os
+from collections import namedtuple
+
+from src.config.settings import (
+    ABILITY_DIR,
+    BASE_DIR,
+    DATA_DIR,
+    OUTPUTS_DIR,
+    PAPERS_DIR,
+)
+
+Stage = namedtuple(
+    "Stage", ["name", "target", "inputs", "outputs", "kwargs"], defaults=({},)
+)
+
+KEYWORD_PATH = os.path.join(DATA_DIR, "keywords")
+EMBEDDING_PATH = os.path.join(BASE_DIR, "data", "downloads", "embedding.save")
+
+
+def output(*names):
+    return [os.path.join(OUTPUTS_DIR, name) for name in names]
+
+
+def store(name):
+    return output(f"{name}.docs", f"{name}.idx")
+
+
+def ability(*names):
+    return [os.path.join(ABILITY_DIR, *name.split("/")) for name in names]
+
+
+def keyword_counts():
+    from src.vectors.pre import keyword_counts, morphs
+
+    keyword_counts.write_keyword_counts(morphs.get_data(KEYWORD_PATH))
+
+
+def export_vectors():
+    from src.vectors.pre import morphs
+
+    morphs.export_vectors(
+        morphs.get_data(KEYWORD_PATH), morphs.get_cluster_data()
+    )
+
+
+def export_distance_from_cluster():
+    from src.vectors.pre import morphs
+
+    morphs.export_distance_from_cluster(morphs.get_cluster_data())
+
+
+def export_comb():
+    from src.vectors.pre import morphs
+
+    morphs.export_comb(morphs.get_data(KEYWORD_PATH))
+
+
+STAGES = [
+    Stage(
+        "pdf_to_csv",
+        "src.preprocessing.from_pdf_to_csv:main",
+        [PAPERS_DIR],
+        output("papers.csv", "index-papers.csv"),
+    ),
+    Stage(
+        "filter_news",
+        "src.scrapy.bigkinds:filter_dup_data",
+        [os.path.join(DATA_DIR, "scrapy", "news-content.csv")],
+        [os.path.join(DATA_DIR, "scrapy", "no-dep-news-content.csv")],
+    ),
+    Stage(
+        "merge_news_papers",
+        "src.merge.news_paper:main",
+        [
+            os.path.join(DATA_DIR, "scrapy", "no-dep-news-content.csv"),
+            *output("index-papers.csv"),
+        ],
+        store("news-papers-merged"),
+    ),
+    Stage(
+        "dedup_news_papers",
+        "src.corpus.dedup:main",
+        store("news-papers-merged"),
+        [*store("news-papers"), *output("news-papers-duplicates.csv")],
+    ),
+    Stage(
+        "word_vector_docs",
+        "src.preprocessing.td_idf:process",
+        store("news-papers"),
+        output("word-vector-docs.csv"),
+    ),
+    Stage(
+        "remove_no_context_rows",
+        "src.preprocessing.td_idf:remove_no_context_rows",
+        output("word-vector-docs.csv"),
+        output("filtered-word-vector-docs.csv"),
+    ),
+    Stage(
+        "reindex_raw_data",
+        "src.preprocessing.td_idf:write_reindex_raw_data",
+        [*store("news-papers"), *output("filtered-word-vector-docs.csv")],
+        store("index-raw-papers"),
+    ),
+    Stage(
+        "td_idf_by_doc",
+        "src.preprocessing.td_idf:write_td_idf_by_doc",
+        store("news-papers"),
+        output("tf-df-idf.csv"),
+    ),
+    Stage(
+        "word_count_by_doc",
+        "src.preprocessing.td_idf:write_word_count_by_doc",
+        output("tf-df-idf.csv"),
+        output("word-count-by-doc.csv"),
+    ),
+    Stage(
+        "cluster_docs",
+        "src.preprocessing.cluster:write_cluster_docs",
+        [*output("filtered-word-vector-docs.csv"), EMBEDDING_PATH],
+        output("cluster-docs.csv", "cluster-center-vectors.csv"),
+    ),
+    Stage(
+        "similarity",
+        "src.preprocessing.similarity:write_similarity",
+        output("cluster-docs.csv"),
+        output("similarity.csv"),
+    ),
+    Stage(
+        "network",
+        "src.preprocessing.similarity:write_network",
+        output("similarity.csv"),
+        output("for-network-draw.csv", "network-detail-draw.csv"),
+    ),
+    Stage(
+        "keyword_counts",
+        "src.pipelines.stages:keyword_counts",
+        [*store("index-raw-papers"), KEYWORD_PATH],
+        output("keyword-counts.npz"),
+    ),
+    Stage(
+        "future_vectors",
+        "src.pipelines.stages:export_vectors",
+        [
+            *output("cluster-docs.csv"),
+            *output("keyword-counts.npz"),
+            KEYWORD_PATH,
+        ],
+        output("future_vectors_raw.csv"),
+    ),
+    Stage(
+        "normalized_future_vectors",
+        "src.vectors.pre.morphs:export_normalized_future_vectors",
+        output("future_vectors_raw.csv"),
+        output("normalized_future_vectors.csv"),
+        {"is_divide": True},
+    ),
+    Stage(
+        "normalized_future_cluster_vectors",
+        "src.vectors.pre.morphs:export_normalized_future_cluster_vectors",
+        output("normalized_future_vectors.csv"),
+        output(
+            "normalized_future_cluster_vectors.csv",
+            "normalized_future_cluster_vectors_euckr.csv",
+        ),
+    ),
+    Stage(
+        "distance_from_cluster",
+        "src.pipelines.stages:export_distance_from_cluster",
+        output(
+            "cluster-docs.csv",
+            "network-detail-draw.csv",
+            "normalized_future_vectors.csv",
+            "normalized_future_cluster_vectors.csv",
+        ),
+        output("normalized_future_vectors_with_distance_from_cluster.csv"),
+    ),
+    Stage(
+        "future_comb",
+        "src.pipelines.stages:export_comb",
+        [KEYWORD_PATH],
+        output("future_comb.csv", "future_comb_euckr.csv"),
+    ),
+    Stage(
+        "cluster_keyword_count",
+        "src.vectors.pre.word_count:main",
+        [
+            *output("cluster-docs.csv"),
+            *output("keyword-counts.npz"),
+            KEYWORD_PATH,
+        ],
+        output(
+            "cluster-keyword-count-map.csv",
+            "cluster-keyword-count-map-euckr.csv",
+        ),
+    ),
+    Stage(
+        "ability_words",
+        "src.preprocessing.ability:to_csv",
+        ability("input/ability.xlsx"),
+        ability("output/words.csv"),
+    ),
+    Stage(
+        "ability_modeling",
+        "src.preprocessing.ability:modeling",
+        ability("output/words.csv"),
+        ability("output/vectors.csv", "output/networks.csv"),
+        {"min_count": 10},
+    ),
+    Stage(
+        "ability_similarity",
+        "src.preprocessing.ability:write_similarity_csv",
+        ability("output/networks.csv"),
+        ability("output/network_for_draw.csv"),
+    ),
+    Stage(
+        "ability_count",
+        "src.preprocessing.ability:write_count",
+        ability("output/network_for_draw.csv"),
+        ability("output/network_helper.json"),
+    ),
+]
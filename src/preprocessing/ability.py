@@ -5,7 +5,6 @@ from collections import defaultdict
 
 from colour import Color
 from gensim.models.word2vec import Word2Vec
-from konlpy.tag import Okt
 import pandas as pd
 from plotly import graph_objs as go
 import networkx as nx
@@ -13,9 +12,9 @@ import matplotlib.pyplot as plt
 from matplotlib import font_manager
 
 from src.config.settings import ABILITY_DIR
-from src.preprocessing.cluster import min_max_normalize
-
-okt = Okt()
+from src.pipelines.instrument import instrument, record
+from src.preprocessing.normalize import min_max_normalize
+from src.preprocessing.tokenizer import iter_nouns
 
 stopwords = {
     "로써",
@@ -57,6 +56,7 @@ singles = {
 }
 
 
+@instrument
 def to_csv():
     df = pd.read_excel(
         os.path.join(ABILITY_DIR, "input", "ability.xlsx")
@@ -64,8 +64,7 @@ def to_csv():
     df.sentence = df.sentence.str.replace("[^ㄱ-ㅎㅏ-ㅣ가-힣 ]", "")
     tokens = []
     singles = set()
-    for s in df.sentence:
-        temp_x = okt.nouns(s)
+    for temp_x in iter_nouns(df.sentence):
         temp = []
         for t in temp_x:
             if t in singles:
@@ -78,13 +77,16 @@ def to_csv():
         {"type": df.type.to_list(), "words": [" ".join(t) for t in tokens]}
     )
     new_df.to_csv(os.path.join(ABILITY_DIR, "output", "words.csv"))
+    record(rows_in=len(df), rows_out=len(new_df))
 
 
+@instrument
 def modeling(min_count=2):
     df = pd.read_csv(os.path.join(ABILITY_DIR, "output", "words.csv")).dropna(
         axis=0
     )
     df.words = df.words.str.split(" ")
+    record(rows_in=len(df))
     word_count_map = defaultdict(int)
     for words in df.words:
         for word in words:
@@ -123,6 +125,7 @@ def modeling(min_count=2):
         w.writerows(networks)
 
 
+@instrument
 def draw_vectors():
     df = pd.read_csv(
         os.path.join(ABILITY_DIR, "output", "vectors.csv")
@@ -142,6 +145,7 @@ def draw_vectors():
         },
     )
     fig = go.Figure(data=[data])
+    record(rows_in=len(df))
 
     fig.write_image("vectors.png", width=2400, height=2400, scale=4)
     print("PNG")
@@ -161,11 +165,13 @@ def draw_vectors():
     # plot_figure = graph_objs.Figure(data=data, layout=layout)
 
 
+@instrument
 def write_similarity_csv():
     df = pd.read_csv(
         os.path.join(ABILITY_DIR, "output", "networks.csv")
     ).dropna(axis=0)
     rank = len(df) // 10
+    record(rows_in=len(df), rows_out=len(df))
     ret = [df.columns.tolist()]
     for idx, row in df.iterrows():
         word, *r = row.tolist()
@@ -186,6 +192,7 @@ def write_similarity_csv():
         w.writerows(ret)
 
 
+@instrument
 def draw_network():
     with open(
         os.path.join(ABILITY_DIR, "output", "network_for_draw.csv")
@@ -194,6 +201,7 @@ def draw_network():
     with open(os.path.join(ABILITY_DIR, "output", "network_helper.json")) as f:
         helper = json.load(f)
     header = reader[0]
+    record(rows_in=len(reader) - 1)
     G = nx.Graph()
     labels = {}
     edge_colors = []
@@ -257,12 +265,14 @@ def draw_network():
     # plt.show()
 
 
+@instrument
 def write_count():
     with open(
         os.path.join(ABILITY_DIR, "output", "network_for_draw.csv")
     ) as f:
         reader = list(csv.reader(f))
     header = reader[0]
+    record(rows_in=len(reader) - 1)
     count_map = defaultdict(int)
     for row in reader[1:]:
         _, *targets = row
@@ -0,0 +1,162 @@
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from src.config.settings import OUTPUTS_DIR
+from src.preprocessing.cluster import read_word_vector_docs
+from src.preprocessing.normalize import normalize_rows
+
+INDEX_PATH = os.path.join(OUTPUTS_DIR, "document-ann.npz")
+
+LSHIndex = namedtuple(
+    "LSHIndex", ["vectors", "planes", "sorted_codes", "sorted_ids"]
+)
+
+
+def hash_codes(vectors, planes):
+    # (n, tables, bits) sign pattern packed into one integer per table
+    n_tables, n_bits, dim = planes.shape
+    projected = vectors @ planes.reshape(-1, dim).T
+    bits = projected.reshape(len(vectors), n_tables, n_bits) > 0
+    weights = 1 << np.arange(n_bits, dtype=np.int64)
+    return (bits * weights).sum(axis=2)
+
+
+def build_index(vectors, n_tables=16, n_bits=12, seed=42):
+    """
+    Build a random-hyperplane LSH index for cosine similarity.
+
+    Every table hashes a document to the signs of ``n_bits`` random
+    projections; documents sharing a bucket in any table become candidates
+    that are then re-ranked exactly.
+    """
+    vectors = normalize_rows(vectors)
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal(
+        (n_tables, n_bits, vectors.shape[1])
+    ).astype(np.float32)
+    codes = hash_codes(vectors, planes)
+    sorted_ids = np.argsort(codes, axis=0, kind="stable").T
+    sorted_codes = np.take_along_axis(codes.T, sorted_ids, axis=1)
+    return LSHIndex(vectors, planes, sorted_codes, sorted_ids)
+
+
+def probe_codes(codes, n_bits, probes):
+    if not probes:
+        return codes[..., None]
+    flips = 1 << np.arange(n_bits, dtype=np.int64)
+    return np.concatenate(
+        [codes[..., None], codes[..., None] ^ flips], axis=-1
+    )
+
+
+def query(index, queries, k=10, probes=1):
+    """
+    Return ``(ids, scores)`` arrays of shape ``(len(queries), k)``.
+
+    ``probes=1`` also visits every bucket one bit away from the query's own,
+    which raises recall at the cost of more candidates. Missing neighbours
+    are padded with id ``-1`` and score ``-inf``.
+    """
+    queries = normalize_rows(np.atleast_2d(queries))
+    n_tables, n_bits, _ = index.planes.shape
+    codes = probe_codes(hash_codes(queries, index.planes), n_bits, probes)
+    lefts = np.empty(codes.shape, dtype=np.int64)
+    rights = np.empty(codes.shape, dtype=np.int64)
+    for table in range(n_tables):
+        lefts[:, table] = np.searchsorted(
+            index.sorted_codes[table], codes[:, table], side="left"
+        )
+        rights[:, table] = np.searchsorted(
+            index.sorted_codes[table], codes[:, table], side="right"
+        )
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    for q in range(len(queries)):
+        candidates = np.unique(
+            np.concatenate(
+                [
+                    index.sorted_ids[table, left:right]
+                    for table in range(n_tables)
+                    for left, right in zip(lefts[q, table], rights[q, table])
+                ]
+            )
+        )
+        if not len(candidates):
+            continue
+        similarity = index.vectors[candidates] @ queries[q]
+        top = min(k, len(candidates))
+        best = np.argpartition(-similarity, top - 1)[:top]
+        best = best[np.argsort(-similarity[best], kind="stable")]
+        ids[q, :top] = candidates[best]
+        scores[q, :top] = similarity[best]
+    return ids, scores
+
+
+def exact_query(vectors, queries, k=10, batch_size=1024):
+    vectors = normalize_rows(vectors)
+    queries = normalize_rows(np.atleast_2d(queries))
+    k = min(k, len(vectors))
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), batch_size):
+        similarity = queries[start : start + batch_size] @ vectors.T
+        best = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        order = np.argsort(
+            -np.take_along_axis(similarity, best, axis=1), axis=1
+        )
+        ids[start : start + batch_size] = np.take_along_axis(
+            best, order, axis=1
+        )
+    return ids
+
+
+def save_index(index, path=INDEX_PATH):
+    np.savez(path, **index._asdict())
+
+
+def load_index(path=INDEX_PATH):
+    with np.load(path) as data:
+        return LSHIndex(*(data[field] for field in LSHIndex._fields))
+
+
+def benchmark(vectors, n_queries=1000, k=10, probes=1, seed=42, **kwargs):
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(vectors), min(n_queries, len(vectors)), False)
+    queries = np.asarray(vectors, dtype=np.float32)[sample]
+
+    started = time.perf_counter()
+    index = build_index(vectors, seed=seed, **kwargs)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    approximate, _ = query(index, queries, k, probes)
+    query_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    exact = exact_query(vectors, queries, k)
+    exact_seconds = time.perf_counter() - started
+
+    hits = sum(
+        len(set(a[a >= 0]) & set(e)) for a, e in zip(approximate, exact)
+    )
+    return {
+        "documents": len(vectors),
+        "queries": len(queries),
+        "k": k,
+        "recall": hits / exact.size,
+        "build_seconds": build_seconds,
+        "query_seconds": query_seconds,
+        "exact_seconds": exact_seconds,
+    }
+
+
+def main():
+    _, vectors = read_word_vector_docs()
+    save_index(build_index(vectors))
+    print(benchmark(vectors))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,256 @@
 import csv
+import hashlib
+import json
 import os
+import shutil
+import tempfile
 import pandas as pd
 import numpy as np
-from bokeh.io.export import export_svg, export_png
-from gensim.models import Word2Vec
-from selenium import webdriver
-from sklearn.cluster import KMeans
-from sklearn.manifold import TSNE
-from src.config.settings import BASE_DIR, OUTPUTS_DIR
+from src.config.settings import BASE_DIR, CACHE_DIR, OUTPUTS_DIR
+from src.pipelines.instrument import instrument, record
+from src.preprocessing.normalize import min_max_normalize, normalize_rows
 import os.path
-import pickle
-from bokeh.plotting import figure, show
-from bokeh.models import HoverTool, ColumnDataSource, value
 
+# gensim, sklearn, bokeh, selenium and the rasterizer are imported inside the
+# functions that use them, so importing this module stays cheap.
 
-def min_max_normalize(lst):
-    normalized = []
+EMBEDDING_PATH = os.path.join(BASE_DIR, "data", "downloads", "embedding.save")
+KEYED_VECTORS_PATH = os.path.join(
+    BASE_DIR, "data", "downloads", "embedding.kv"
+)
 
-    for v in lst:
-        try:
-            normalized_num = (v - min(lst)) / (max(lst) - min(lst))
-        except ZeroDivisionError:
-            normalized_num = 0
+KEYED_VECTORS_SOURCE_PATH = f"{KEYED_VECTORS_PATH}.source.json"
+# Larger inputs are charted from a t-SNE of this many sampled points.
+TSNE_SAMPLE_SIZE = 10000
 
-        normalized.append(normalized_num)
+word_vectors = None
 
-    return normalized
 
+def embedding_fingerprint():
+    try:
+        stat = os.stat(EMBEDDING_PATH)
+    except FileNotFoundError:
+        return None
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
 
-model = Word2Vec.load(
-    os.path.join(BASE_DIR, "data", "downloads", "embedding.save")
-)
+
+def load_keyed_vectors_source():
+    try:
+        with open(KEYED_VECTORS_SOURCE_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def export_keyed_vectors():
+    """
+    Export the KeyedVectors of the Word2Vec model at EMBEDDING_PATH.
+
+    The files are saved into a temporary directory and moved into place,
+    the ``.kv`` file after its arrays, so an interrupted export never
+    leaves partial files behind. The model's size and mtime are recorded
+    last, next to the ``.kv``.
+    """
+    from gensim.models import Word2Vec
+
+    fingerprint = embedding_fingerprint()
+    directory = os.path.dirname(KEYED_VECTORS_PATH)
+    name = os.path.basename(KEYED_VECTORS_PATH)
+    if os.path.exists(KEYED_VECTORS_SOURCE_PATH):
+        os.remove(KEYED_VECTORS_SOURCE_PATH)
+    tmp_dir = tempfile.mkdtemp(dir=directory)
+    try:
+        Word2Vec.load(EMBEDDING_PATH).wv.save(os.path.join(tmp_dir, name))
+        for filename in sorted(os.listdir(tmp_dir), key=lambda f: f == name):
+            os.replace(
+                os.path.join(tmp_dir, filename),
+                os.path.join(directory, filename),
+            )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    with open(f"{KEYED_VECTORS_SOURCE_PATH}.tmp", "w") as f:
+        json.dump(fingerprint, f)
+    os.replace(f"{KEYED_VECTORS_SOURCE_PATH}.tmp", KEYED_VECTORS_SOURCE_PATH)
+
+
+def get_word_vectors():
+    """
+    Load the embedding on first use as read-only, memory-mapped vectors.
+
+    The full Word2Vec model is only read to export its KeyedVectors, again
+    whenever its size or mtime changes; otherwise every process maps the
+    same vector file instead of holding a private copy of the model.
+    """
+    global word_vectors
+    if word_vectors is None:
+        from gensim.models import KeyedVectors
+
+        fingerprint = embedding_fingerprint()
+        if not os.path.exists(KEYED_VECTORS_PATH) or (
+            fingerprint is not None
+            and load_keyed_vectors_source() != fingerprint
+        ):
+            export_keyed_vectors()
+        word_vectors = KeyedVectors.load(KEYED_VECTORS_PATH, mmap="r")
+    return word_vectors
 
 
 def get_tokens(context):
     return [c for c in context.split(" ") if len(c) > 1]
 
 
-def get_sentence_mean_vector(morphs):
-    vector = []
-    for i in morphs:
-        try:
-            vector.append(model.wv[i])
-        except KeyError:
-            pass
+def get_vocabulary(wv):
     try:
-        return np.mean(vector, axis=0)
-    except IndexError:
-        pass
+        return wv.key_to_index
+    except AttributeError:
+        return {word: vocab.index for word, vocab in wv.vocab.items()}
 
 
-def draw_chart(df):
-    driver = webdriver.Chrome(os.path.join(BASE_DIR, "chromedriver"))
-    X = df["wv"].to_list()
+def embed_documents(token_lists, chunk_tokens=1_000_000):
+    """
+    Return the mean word vector of every document as one float32 matrix.
+
+    Tokens are mapped to vocabulary ids in one pass, then each chunk of
+    documents is reduced with ``np.add.reduceat`` over the flat id array.
+    Documents without a single known token get a zero row. The second
+    return value holds the number of known tokens per document.
+    """
+    wv = get_word_vectors()
+    vocabulary = get_vocabulary(wv)
+    ids = []
+    counts = []
+    for tokens in token_lists:
+        doc_ids = [vocabulary[t] for t in tokens if t in vocabulary]
+        ids.extend(doc_ids)
+        counts.append(len(doc_ids))
+    ids = np.array(ids, dtype=np.int64)
+    counts = np.array(counts, dtype=np.int64)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    matrix = np.zeros((len(counts), wv.vectors.shape[1]), dtype=np.float32)
+    first = 0
+    while first < len(counts):
+        last = np.searchsorted(ends, starts[first] + chunk_tokens, "right")
+        last = max(int(last), first + 1)
+        present = np.flatnonzero(counts[first:last]) + first
+        if len(present):
+            begin = starts[first]
+            gathered = np.asarray(
+                wv.vectors[ids[begin : ends[last - 1]]], dtype=np.float32
+            )
+            matrix[present] = np.add.reduceat(
+                gathered, starts[present] - begin, axis=0
+            )
+            matrix[present] /= counts[present, None]
+        first = last
+    return matrix, counts
+
+
+def projection_key(X, params):
+    X = np.ascontiguousarray(X)
+    digest = hashlib.sha1()
+    digest.update(str((X.shape, X.dtype.str)).encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    digest.update(X.data)
+    return digest.hexdigest()
+
+
+def project_2d(
+    X, pca_components=50, sample_size=None, n_neighbors=10, random_state=42
+):
+    """
+    Project ``X`` to 2-D with Barnes-Hut t-SNE, caching by content.
+
+    ``X`` is first reduced with PCA and t-SNE starts from a PCA layout.
+    With ``sample_size`` only a random sample is embedded; every other
+    point is placed at the distance-weighted mean of its nearest sampled
+    neighbours. Results are cached under ``CACHE_DIR`` keyed by a hash of
+    ``X`` and these parameters, so changed inputs never hit a stale file.
+    """
+    params = {
+        "pca_components": pca_components,
+        "sample_size": sample_size,
+        "n_neighbors": n_neighbors,
+        "random_state": random_state,
+    }
+    cache_path = os.path.join(
+        CACHE_DIR, "projections", f"{projection_key(X, params)}.npy"
+    )
+    if os.path.exists(cache_path):  # Cache Hits!
+        return np.load(cache_path)
+
+    from sklearn.decomposition import PCA
+    from sklearn.manifold import TSNE
+    from sklearn.neighbors import NearestNeighbors
+
+    X = np.asarray(X, dtype=np.float32)
+    components = min(pca_components, *X.shape)
+    reduced = PCA(n_components=components, random_state=random_state)
+    reduced = reduced.fit_transform(X)
+    if sample_size and sample_size < len(X):
+        rng = np.random.default_rng(random_state)
+        sample = np.sort(rng.choice(len(X), sample_size, replace=False))
+    else:
+        sample = np.arange(len(X))
+    tsne = TSNE(method="barnes_hut", init="pca", random_state=random_state)
+    points = np.empty((len(X), 2), dtype=np.float32)
+    points[sample] = tsne.fit_transform(reduced[sample])
+
+    rest = np.setdiff1d(np.arange(len(X)), sample)
+    if len(rest):
+        neighbors = NearestNeighbors(n_neighbors=min(n_neighbors, len(sample)))
+        distances, indices = neighbors.fit(reduced[sample]).kneighbors(
+            reduced[rest]
+        )
+        weights = 1 / np.maximum(distances, 1e-12)
+        weights /= weights.sum(axis=1, keepdims=True)
+        points[rest] = np.einsum(
+            "ij,ijk->ik", weights, points[sample][indices]
+        )
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.save(f"{cache_path}.tmp.npy", points)
+    os.replace(f"{cache_path}.tmp.npy", cache_path)
+    return points
+
+
+@instrument
+def draw_chart(df, X, raster=False, sample_size=TSNE_SAMPLE_SIZE):
+    """
+    Plot the 2-d projection of ``X`` coloured by cluster. With ``raster``
+    the points are binned straight into ``cluster.png`` with numpy, which
+    needs no browser and stays fast for millions of documents; otherwise
+    Bokeh exports ``cluster.svg`` and ``cluster.png`` through Chrome.
+
+    Above ``sample_size`` documents t-SNE only embeds a sample of that
+    size and places the rest by their neighbours (see ``project_2d``);
+    ``None`` embeds every document.
+    """
     y = df["cluster"].to_list()
-    tsne_filepath = "tsne3000.pkl"
-
-    if not os.path.exists(tsne_filepath):
-        tsne = TSNE(random_state=42)
-        tsne_points = tsne.fit_transform(X)
-        with open(tsne_filepath, "wb+") as f:
-            pickle.dump(tsne_points, f)
-    else:  # Cache Hits!
-        with open(tsne_filepath, "rb") as f:
-            tsne_points = pickle.load(f)
+    tsne_points = project_2d(X, sample_size=sample_size)
+    record(rows_in=len(X))
+    colormap = {0: "#ffee33", 1: "#00a152", 2: "#2979ff", 3: "#d500f9"}
+    if raster:
+        from src.charts.raster import scatter_png
+
+        scatter_png(
+            "cluster.png",
+            tsne_points[:, 0],
+            tsne_points[:, 1],
+            y,
+            [colormap[c] for c in sorted(colormap)],
+            width=1200,
+            height=1200,
+            radius=2,
+        )
+        return
+    from bokeh.io.export import export_png, export_svg
+    from bokeh.models import ColumnDataSource, HoverTool, value
+    from bokeh.plotting import figure, show
+    from selenium import webdriver
+
+    driver = webdriver.Chrome(os.path.join(BASE_DIR, "chromedriver"))
     tsne_df = pd.DataFrame(
         tsne_points, index=range(len(X)), columns=["x_coord", "y_coord"]
     )
@@ -71,7 +258,6 @@ def draw_chart(df):
     tsne_df["title"] = df["title"].to_list()
     tsne_df["tokens_len"] = df["tokens_len"].to_list()
     tsne_df["cluster_no"] = y
-    colormap = {0: "#ffee33", 1: "#00a152", 2: "#2979ff", 3: "#d500f9"}
     colors = [colormap[x] for x in tsne_df["cluster_no"]]
     tsne_df["color"] = colors
     normalized = min_max_normalize(tsne_df.tokens_len.to_list())
@@ -117,21 +303,20 @@ def draw_chart(df):
     )
 
 
-def read_word_vector_docs():
-    df = pd.read_csv(
-        os.path.join(OUTPUTS_DIR, "filtered-word-vector-docs.csv")
-    )
-    df["tokens"] = df["context"].map(get_tokens)
-    df["tokens_len"] = df["tokens"].map(len)
-    df["wv"] = df["tokens"].map(get_sentence_mean_vector)
-    word_vectors = df.wv.to_list()
-    num_clusters = 4
-    kmeans_clustering = KMeans(n_clusters=num_clusters, random_state=42)
-    idx = kmeans_clustering.fit_predict(word_vectors)
-    df["cluster"] = idx
-    centroids = kmeans_clustering.cluster_centers_
-    distances = []
-    # print(word_vectors)
+def centroid_distances(vectors, centroids, labels):
+    vectors = normalize_rows(vectors)
+    centroids = normalize_rows(centroids)
+    return 1 - np.einsum("ij,ij->i", vectors, centroids[labels])
+
+
+def embed_frame(df):
+    tokens = df["context"].map(get_tokens)
+    df["tokens_len"] = tokens.map(len)
+    word_vectors, _ = embed_documents(tokens)
+    return word_vectors
+
+
+def write_cluster_centers(centroids):
     f = open(
         os.path.join(OUTPUTS_DIR, "cluster-center-vectors.csv"),
         "w",
@@ -142,25 +327,111 @@ def read_word_vector_docs():
     for i, center in enumerate(centroids):
         writer.writerow([i, *center])
     f.close()
-    for idx, i in enumerate(idx):
-        center = centroids[i]
 
-        # mean_distance = np.mean(center,)
-        # print(mean_distance)
-        distance = 1 - np.dot(center, word_vectors[idx]) / (
-            np.linalg.norm(center) * np.linalg.norm(word_vectors[idx])
+
+@instrument
+def read_word_vector_docs():
+    """
+    Cluster the filtered documents and attach ``cluster`` and
+    ``distance_from_cluster`` columns.
+    """
+    path = os.path.join(OUTPUTS_DIR, "filtered-word-vector-docs.csv")
+    num_clusters = 4
+    from sklearn.cluster import KMeans
+
+    df = pd.read_csv(path)
+    word_vectors = embed_frame(df)
+    kmeans_clustering = KMeans(n_clusters=num_clusters, random_state=42)
+    idx = kmeans_clustering.fit_predict(word_vectors)
+    df["cluster"] = idx
+    centroids = kmeans_clustering.cluster_centers_
+    write_cluster_centers(centroids)
+    df["distance_from_cluster"] = centroid_distances(
+        word_vectors, centroids, idx
+    )
+    record(rows_in=len(df), rows_out=len(df))
+    return df, word_vectors
+
+
+@instrument
+def stream_cluster_docs(out_path, chunk_size=10000, epochs=3):
+    """
+    ``read_word_vector_docs`` for corpora that do not fit in memory, writing
+    the clustered documents to ``out_path`` as it goes.
+
+    The first pass embeds ``chunk_size`` documents at a time, spills their
+    vectors to a float32 file in CACHE_DIR and feeds them to
+    ``MiniBatchKMeans.partial_fit``. ``epochs - 1`` more passes replay the
+    spilled chunks in shuffled order, so the centroids do not lean towards
+    the start of the file. A last pass reads the documents again and
+    appends them with their cluster and distance. Only one chunk of
+    documents or vectors is in memory at a time.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    path = os.path.join(OUTPUTS_DIR, "filtered-word-vector-docs.csv")
+    vectors_path = os.path.join(CACHE_DIR, "cluster-vectors.f32")
+    num_clusters = 4
+    kmeans_clustering = MiniBatchKMeans(
+        n_clusters=num_clusters, random_state=42
+    )
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    dim = None
+    with open(vectors_path, "wb") as f:
+        for df in pd.read_csv(path, usecols=["context"], chunksize=chunk_size):
+            word_vectors = embed_frame(df)
+            dim = word_vectors.shape[1]
+            kmeans_clustering.partial_fit(word_vectors)
+            f.write(word_vectors.tobytes())
+    if dim is None:
+        os.remove(vectors_path)
+        raise ValueError(f"no documents in {path}")
+
+    vectors = np.memmap(vectors_path, dtype=np.float32, mode="r")
+    vectors = vectors.reshape(-1, dim)
+    starts = np.arange(0, len(vectors), chunk_size)
+    rng = np.random.default_rng(42)
+    for _ in range(epochs - 1):
+        for start in rng.permutation(starts):
+            kmeans_clustering.partial_fit(vectors[start : start + chunk_size])
+    centroids = kmeans_clustering.cluster_centers_
+    write_cluster_centers(centroids)
+
+    start = 0
+    for df in pd.read_csv(path, chunksize=chunk_size):
+        word_vectors = vectors[start : start + len(df)]
+        idx = kmeans_clustering.predict(word_vectors)
+        df["cluster"] = idx
+        df["distance_from_cluster"] = centroid_distances(
+            word_vectors, centroids, idx
+        )
+        df.to_csv(
+            out_path,
+            mode="a" if start else "w",
+            header=not start,
+            index=False,
         )
-        distances.append(distance)
-    df["distance_from_cluster"] = distances
-    return df
+        start += len(df)
+    del vectors
+    os.remove(vectors_path)
+    record(rows_in=start, rows_out=start)
+
+
+@instrument
+def write_cluster_docs(mini_batch=False, epochs=3):
+    path = os.path.join(OUTPUTS_DIR, "cluster-docs.csv")
+    if mini_batch:
+        stream_cluster_docs(path, epochs=epochs)
+        return
+    df, word_vectors = read_word_vector_docs()
+    del df["tokens_len"]
+    df.to_csv(path, index=False)
 
 
 def main():
-    df = read_word_vector_docs()
-    # draw_chart(df)
-    # del df["wv"]
+    df, word_vectors = read_word_vector_docs()
+    # draw_chart(df, word_vectors)
     # del df["tokens_len"]
-    # del df["tokens"]
     # df.to_csv(os.path.join(OUTPUTS_DIR, "cluster-docs.csv"), index=False)
 
 
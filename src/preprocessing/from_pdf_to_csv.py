@@ -1,13 +1,20 @@
 import csv
+import json
 import multiprocessing
 import os
 import re
 import sys
 from src.config.settings import PAPERS_DIR, OUTPUTS_DIR
+from src.pipelines.instrument import instrument, record
+from src.utils.files import hash_file
 import pdftotext
 
 csv.field_size_limit(sys.maxsize)
 
+PAPERS_PATH = os.path.join(OUTPUTS_DIR, "papers.csv")
+INDEX_PAPERS_PATH = os.path.join(OUTPUTS_DIR, "index-papers.csv")
+MANIFEST_PATH = os.path.join(OUTPUTS_DIR, "papers-manifest.json")
+
 
 def get_years():
     return os.listdir(PAPERS_DIR)
@@ -17,19 +24,20 @@ def walk_papers(year):
     return os.listdir(os.path.join(PAPERS_DIR, year))
 
 
+def iter_papers():
+    for year in get_years():
+        for paper in walk_papers(year):
+            yield paper, year
+
+
 def read_pdf(path):
-    file = open(path, "rb")
-    try:
-        pdf = pdftotext.PDF(file)
-        text = ""
-        for page in pdf:
-            text += page
-        file.close()
-        return text
-    except pdftotext.Error:
-        print(file, "unlock")
+    with open(path, "rb") as file:
+        try:
+            return "".join(pdftotext.PDF(file))
+        except pdftotext.Error:
+            print(file, "unlock")
 
-        return ""
+            return ""
 
 
 def write_row(item):
@@ -43,40 +51,140 @@ def write_row(item):
     return ["논문", year, title, context]
 
 
-def to_csv():
-    file = open(os.path.join(OUTPUTS_DIR, "papers.csv"), "w")
-    w = csv.writer(file)
-    w.writerow(["cate", "year", "title", "context"])
-    years = get_years()
-    for year in years:
-        papers = walk_papers(year)
-        papers = [(paper, year) for paper in papers]
-        with multiprocessing.Pool(
-            processes=multiprocessing.cpu_count() * 2
-        ) as pool:
-            data = pool.map(write_row, papers)
-        for row in data:
-            w.writerow(row)
-    file.close()
-
-
-def apply_index_to_csv():
-    file = open(os.path.join(OUTPUTS_DIR, "index-papers.csv"), "w")
-    w = csv.writer(file)
-    w.writerow(["index", "cate", "year", "title", "context"])
-    with open(os.path.join(OUTPUTS_DIR, "papers.csv")) as f:
-        reader = csv.reader(f)
-        for index, row in enumerate(reader):
-            if index == 0:
-                continue
-            w.writerow([index, *row])
-
-    file.close()
+def extract_row(item):
+    return item, write_row(item)
 
 
-def main():
-    to_csv()
-    apply_index_to_csv()
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def new_manifest():
+    for path, header in [
+        (PAPERS_PATH, ["cate", "year", "title", "context"]),
+        (INDEX_PAPERS_PATH, ["index", "cate", "year", "title", "context"]),
+    ]:
+        with open(path, "w") as f:
+            csv.writer(f).writerow(header)
+    return {"files": {}, "indexes": {}, "sizes": output_sizes()}
+
+
+def output_sizes():
+    """
+    Sizes of both outputs, keyed by their path relative to OUTPUTS_DIR so
+    the manifest stays valid when the data directory moves.
+    """
+    return {
+        os.path.relpath(path, OUTPUTS_DIR): os.path.getsize(path)
+        for path in [PAPERS_PATH, INDEX_PAPERS_PATH]
+    }
+
+
+def pending_papers(manifest):
+    for paper, year in iter_papers():
+        key = os.path.join(year, paper)
+        before = manifest["files"].get(key)
+        sha1 = hash_file(
+            os.path.join(PAPERS_DIR, key), manifest["files"], key
+        )
+        if (
+            key not in manifest["indexes"]
+            or before is None
+            or before["sha1"] != sha1
+        ):
+            yield paper, year
+
+
+def replace_rows(changed):
+    """
+    Rewrite both outputs with the rows of re-extracted papers swapped in
+    place, so their indexes do not move.
+    """
+    for path, with_index in [(PAPERS_PATH, False), (INDEX_PAPERS_PATH, True)]:
+        with open(path) as src, open(f"{path}.tmp", "w") as dst:
+            w = csv.writer(dst)
+            for index, row in enumerate(csv.reader(src)):
+                if index in changed:
+                    row = changed[index]
+                    if with_index:
+                        row = [index, *row]
+                w.writerow(row)
+        os.replace(f"{path}.tmp", path)
+
+
+@instrument
+def to_csv(rebuild=False, processes=None, chunksize=4):
+    """
+    Bring ``papers.csv`` and ``index-papers.csv`` up to date with PAPERS_DIR.
+
+    A manifest records size, mtime and content hash of every extracted PDF
+    together with the index it was given, keyed by paths relative to
+    PAPERS_DIR and OUTPUTS_DIR. Only new or changed files are
+    extracted on one shared pool: new papers are appended under the next
+    free index, changed ones are rewritten in place. Rows of PDFs that
+    disappeared are kept so later indexes stay stable.
+    """
+    manifest = load_manifest()
+    if (
+        rebuild
+        or manifest is None
+        or not os.path.exists(PAPERS_PATH)
+        or not os.path.exists(INDEX_PAPERS_PATH)
+        or manifest["sizes"].keys() != output_sizes().keys()
+    ):
+        manifest = new_manifest()
+    # Drop rows appended by an interrupted run the manifest never recorded.
+    for name, size in manifest["sizes"].items():
+        os.truncate(os.path.join(OUTPUTS_DIR, name), size)
+
+    indexes = manifest["indexes"]
+    pending = list(pending_papers(manifest))
+    next_index = max(indexes.values(), default=0) + 1
+    changed = {}
+    papers_file = open(PAPERS_PATH, "a")
+    index_file = open(INDEX_PAPERS_PATH, "a")
+    papers_writer = csv.writer(papers_file)
+    index_writer = csv.writer(index_file)
+    if pending:
+        with multiprocessing.Pool(
+            processes=processes or multiprocessing.cpu_count() * 2
+        ) as pool:
+            for (paper, year), row in pool.imap_unordered(
+                extract_row, pending, chunksize=chunksize
+            ):
+                key = os.path.join(year, paper)
+                if key in indexes:
+                    changed[indexes[key]] = row
+                else:
+                    indexes[key] = next_index
+                    papers_writer.writerow(row)
+                    index_writer.writerow([next_index, *row])
+                    next_index += 1
+                record(rows_in=1, rows_out=1)
+    papers_file.close()
+    index_file.close()
+    if changed:
+        replace_rows(changed)
+    manifest["sizes"] = output_sizes()
+    save_manifest(manifest)
+    print(
+        f"{len(pending) - len(changed)} new, {len(changed)} changed, "
+        f"{len(indexes)} papers"
+    )
+
+
+def main(rebuild=False):
+    to_csv(rebuild=rebuild)
 
 
 if __name__ == "__main__":
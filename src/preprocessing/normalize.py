@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def min_max_normalize(lst):
+    normalized = []
+
+    for v in lst:
+        try:
+            normalized_num = (v - min(lst)) / (max(lst) - min(lst))
+        except ZeroDivisionError:
+            normalized_num = 0
+
+        normalized.append(normalized_num)
+
+    return normalized
+
+
+def min_max_columns(matrix, mask=None):
+    """
+    ``min_max_normalize`` applied to every column of ``matrix`` at once,
+    taking only the cells where ``mask`` is true into account. Constant
+    columns map to 0; cells outside ``mask`` are left undefined.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if mask is None:
+        mask = np.ones(matrix.shape, dtype=bool)
+    low = np.where(mask, matrix, np.inf).min(axis=0, initial=np.inf)
+    high = np.where(mask, matrix, -np.inf).max(axis=0, initial=-np.inf)
+    span = high - low
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scaled = (matrix - low) / span
+    return np.where(span > 0, scaled, 0.0)
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
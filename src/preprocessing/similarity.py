@@ -1,22 +1,26 @@
 import csv
+import multiprocessing
 import os
 import sys
-from collections import defaultdict
-
-from pyvis.network import Network
-import matplotlib.pyplot as plt
-
-from sklearn.feature_extraction.text import TfidfVectorizer
+from collections import defaultdict, deque
 
 from src.config.settings import OUTPUTS_DIR
-from src.preprocessing.cluster import min_max_normalize
-import pandas as pd
-import networkx as nx
+from src.corpus.reader import iter_documents, iter_rows, read_header
+from src.pipelines.instrument import instrument, record
+from src.preprocessing.normalize import min_max_normalize
+import numpy as np
 
 csv.field_size_limit(sys.maxsize)
 
+SAME_CLUSTER_TOP_K = 5
+OTHER_CLUSTER_TOP_K = 1
 
+
+@instrument
 def draw_network():
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     color_map = {
         "3": "#F2C34B",
         "2": "#48A985",
@@ -35,6 +39,7 @@ def draw_network():
     with open(os.path.join(OUTPUTS_DIR, "for-network-draw.csv")) as f:
         reader = list(csv.reader(f))
     nodes = {(r[1], r[3], r[5]) for r in reader[1:]}
+    record(rows_in=len(reader) - 1)
     G = nx.Graph()
     normalized = []
     nodes = list(nodes)
@@ -108,7 +113,10 @@ def draw_network():
     plt.show()
 
 
+@instrument
 def draw_chart():
+    from pyvis.network import Network
+
     net = Network("1600px", "1600px", bgcolor="#22222")
     colors = {
         "3": "#ffee33",
@@ -116,12 +124,10 @@ def draw_chart():
         "1": "#2979ff",
         "0": "#d500f9",
     }
-    with open(os.path.join(OUTPUTS_DIR, "similarity.csv")) as f:
-        reader = list(csv.reader(f))
-        reader.pop(0)
+    path = os.path.join(OUTPUTS_DIR, "similarity.csv")
     count_map = defaultdict(int)
-    sizes = [0] * (len(reader) + 1)
-    for row in reader:
+    sizes = [0] * (len(read_header(path)) - 2)
+    for row in iter_rows(path):
         index, title, cluster, *rows = row
         for idx, r in enumerate(rows, 1):
             if index != str(idx) and r != "0":
@@ -129,7 +135,7 @@ def draw_chart():
     for index, value in count_map.items():
         sizes[index] = value
     normalized = min_max_normalize(sizes)
-    for row in reader:
+    for row in iter_rows(path):
         index, title, cluster, *rows = row
         color = colors[cluster]
         net.add_node(
@@ -138,78 +144,124 @@ def draw_chart():
             color=color,
             size=20 + (normalized[int(index)] * 100),
         )
-    for row in reader:
+    for row in iter_rows(path):
         index, title, cluster, *rows = row
         for idx, r in enumerate(rows, 1):
             if index != str(idx) and r != "0":
                 end_color = colors[cluster]
                 net.add_edge(index, str(idx), color=end_color, weight=float(r))
+    record(rows_in=len(sizes) - 1)
     net.set_edge_smooth("dynamic")
     net.show_buttons(filter_=["physics"])
     # net.show("nx.html")
     net.show("nx.html")
 
 
-def write_similarity():
-    docs = []
-    clusters = []
-    vect = TfidfVectorizer()
-    with open(os.path.join(OUTPUTS_DIR, "cluster-docs.csv")) as f:
-        reader = list(csv.reader(f))
-        reader.pop(0)
-        for row in reader:
-            *remain, context, cluster, cluster_distance = row
-            clusters.append(cluster)
-            docs.append(context)
-    tfidf = vect.fit_transform(docs)
-    matrix = (tfidf * tfidf.T).A
-    listed = matrix.tolist()
-    raw = []
-    for idx, row in enumerate(listed):
-        raw.append([1 - r for r in row])
-        current_cluster = clusters[idx]
-        df = pd.DataFrame(
-            {"index": range(len(row)), "value": row, "cluster": clusters}
-        )
-        sort = (
-            df.loc[df.cluster == current_cluster]
-            .sort_values(by="value", ascending=False)
-            .head(5)
-        )
-        top3 = sort.index.tolist()
-        sort = (
-            df.loc[df.cluster != current_cluster]
-            .sort_values(by="value", ascending=False)
-            .head(1)
-        )
-        top2 = sort.index.tolist()
-        top5 = set(top3 + top2)
-        for i in range(len(row)):
-            if i not in top5:
-                row[i] = 0
-            else:
-                row[i] = 1
+def init_similarity_worker(tfidf, clusters):
+    global worker_tfidf, worker_clusters
+    worker_tfidf = tfidf
+    worker_clusters = clusters
 
-    file = open(os.path.join(OUTPUTS_DIR, "similarity.csv"), "w")
-    w = csv.writer(file)
-    w.writerow(["index", "title", "cluster", *list(range(1, len(reader) + 1))])
-    for index, row in enumerate(listed):
-        w.writerow([index + 1, reader[index][3], reader[index][5], *row])
 
-    file.close()
+def mark_top_k(mask, values, k):
+    k = min(k, values.shape[1])
+    if k == 0:
+        return
+    selected = np.argpartition(-values, k - 1, axis=1)[:, :k]
+    rows = np.repeat(np.arange(values.shape[0])[:, None], k, axis=1)
+    found = np.isfinite(np.take_along_axis(values, selected, axis=1))
+    mask[rows[found], selected[found]] = 1
 
-    file = open(os.path.join(OUTPUTS_DIR, "similarity-raw.csv"), "w")
-    w = csv.writer(file)
-    w.writerow(["index", "title", "cluster", *list(range(1, len(reader) + 1))])
-    for index, row in enumerate(raw):
-        w.writerow([index + 1, reader[index][3], reader[index][5], *row])
 
+def similarity_block(bounds):
+    start, end, with_raw = bounds
+    block = (worker_tfidf[start:end] * worker_tfidf.T).toarray()
+    same = worker_clusters[start:end, None] == worker_clusters[None, :]
+    mask = np.zeros(block.shape, dtype=np.int8)
+    mark_top_k(mask, np.where(same, block, -np.inf), SAME_CLUSTER_TOP_K)
+    mark_top_k(mask, np.where(same, -np.inf, block), OTHER_CLUSTER_TOP_K)
+    raw = (1 - block).astype(np.float32) if with_raw else None
+    return mask, raw
+
+
+def imap_bounded(pool, func, items, max_in_flight):
+    """
+    ``pool.imap`` that submits at most ``max_in_flight`` items ahead of the
+    consumer, so a slow consumer does not let results pile up in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+@instrument
+def write_similarity(processes=None, block_size=512, with_raw=False):
+    """
+    Mark, for every document, its 5 most similar documents in the same
+    cluster and the most similar one in any other cluster.
+
+    The cosine matrix is never materialized: row blocks of ``tfidf * tfidf.T``
+    are computed in a process pool, reduced to their top-k with
+    ``argpartition`` and streamed to ``similarity.csv``. At most two blocks
+    per worker are in flight, so memory stays at a few blocks however many
+    documents there are. ``with_raw`` also writes the cosine distances to
+    ``similarity-raw.csv``, which grows quadratically.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vect = TfidfVectorizer()
+    path = os.path.join(OUTPUTS_DIR, "cluster-docs.csv")
+    reader = list(iter_documents(path, ["index", "title", "cluster"]))
+    clusters = np.array([row.cluster for row in reader])
+    tfidf = vect.fit_transform(
+        row.context for row in iter_documents(path, ["context"])
+    ).tocsr()
+    header = ["index", "title", "cluster", *list(range(1, len(reader) + 1))]
+    blocks = [
+        (start, min(start + block_size, len(reader)), with_raw)
+        for start in range(0, len(reader), block_size)
+    ]
+    processes = processes or multiprocessing.cpu_count()
+
+    file = open(os.path.join(OUTPUTS_DIR, "similarity.csv"), "w")
+    w = csv.writer(file)
+    w.writerow(header)
+    if with_raw:
+        raw_file = open(os.path.join(OUTPUTS_DIR, "similarity-raw.csv"), "w")
+        raw_w = csv.writer(raw_file)
+        raw_w.writerow(header)
+    with multiprocessing.Pool(
+        processes=processes,
+        initializer=init_similarity_worker,
+        initargs=(tfidf, clusters),
+    ) as pool:
+        index = 0
+        for mask, raw in imap_bounded(
+            pool, similarity_block, blocks, 2 * processes
+        ):
+            for i, row in enumerate(mask):
+                meta = reader[index]
+                w.writerow(
+                    [index + 1, meta.title, meta.cluster, *row.tolist()]
+                )
+                record(rows_in=1, rows_out=1)
+                if with_raw:
+                    raw_w.writerow(
+                        [index + 1, meta.title, meta.cluster, *raw[i].tolist()]
+                    )
+                index += 1
     file.close()
+    if with_raw:
+        raw_file.close()
 
 
+@instrument
 def write_network():
-    with open(os.path.join(OUTPUTS_DIR, "similarity.csv")) as f:
-        reader = list(csv.reader(f))
+    path = os.path.join(OUTPUTS_DIR, "similarity.csv")
     weights = [["index", "title", "cluster", "connected_count"]]
     count_map = defaultdict(int)
     for_draw = [
@@ -224,15 +276,15 @@ def write_network():
     ]
     d_idx = 1
     cluster_map = {}
-    for row in reader[1:]:
+    for row in iter_rows(path):
         index, title, cluster, *normalized = row
         cluster_map[index] = cluster
-    for row in reader[1:]:
+    for row in iter_rows(path):
         index, title, cluster, *normalized = row
         for target_index, value in enumerate(normalized, 1):
             if value != "0" and index != str(target_index):
                 count_map[str(target_index)] += 1
-    for row in reader[1:]:
+    for row in iter_rows(path):
         index, title, cluster, *normalized = row
         for target_index, value in enumerate(normalized, 1):
             if value != "0" and index != str(target_index):
@@ -247,9 +299,10 @@ def write_network():
                 for_draw.append(r)
                 d_idx += 1
 
-    for row in reader[1:]:
+    for row in iter_rows(path):
         index, title, cluster, *normalized = row
         weights.append([index, title, cluster, count_map[index]])
+    record(rows_in=len(weights) - 1, rows_out=len(for_draw) - 1)
     with open(os.path.join(OUTPUTS_DIR, "for-network-draw.csv"), "w") as f:
         w = csv.writer(f)
         w.writerows(for_draw)
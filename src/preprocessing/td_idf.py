@@ -3,37 +3,46 @@ import os
 import sys
 from math import log
 
+import numpy as np
 import pandas as pd
-from konlpy.tag import Okt
+from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 from src.config.settings import OUTPUTS_DIR
+from src.corpus.reader import iter_records
+from src.corpus.store import (
+    INDEX_RAW_PAPERS_STORE,
+    NEWS_PAPERS_STORE,
+    open_store,
+    write_store,
+)
+from src.pipelines.instrument import instrument, record
+from src.preprocessing.tokenizer import iter_line_nouns, iter_nouns
 
 csv.field_size_limit(sys.maxsize)
 
-otk = Okt()
+META_COLUMNS = ["index", "cate", "year", "title"]
 
 
-def get_papers():
-    with open(os.path.join(OUTPUTS_DIR, "news-papers.csv")) as f:
-        reader = csv.reader(f)
-        return list(reader)
+def get_papers(columns=None):
+    return open_store(NEWS_PAPERS_STORE).iter_documents(columns)
 
 
-def count_all():
-    papers = get_papers()
-    papers.pop(0)
+@instrument
+def count_all(processes=None):
     ret = set()
-    for paper in papers:
-        *remain, context = paper
-        nouns = otk.nouns(context)
-
+    contexts = (paper.context for paper in get_papers(["context"]))
+    for paper, nouns in zip(
+        get_papers(META_COLUMNS), iter_nouns(contexts, processes)
+    ):
         for n in nouns:
             ret.add(n)
-        print(remain, len(ret))
+        record(rows_in=1)
+        print(list(paper), len(ret))
     return len(ret)
 
 
+@instrument
 def remove_no_context_rows():
     file = open(
         os.path.join(OUTPUTS_DIR, "filtered-word-vector-docs.csv"), "w"
@@ -47,18 +56,17 @@ def remove_no_context_rows():
             if idx == 0:
                 continue
             _, *remain, context = row
+            record(rows_in=1)
             if len(context) > 10:
                 w.writerow([count, *remain, context])
+                record(rows_out=1)
                 count += 1
 
 
-def process_nouns(row):
+def process_nouns(row, line_nouns):
     vectorizer = TfidfVectorizer()
-    *remain, context = row
-    lines = context.split("\n")
     noun_lines = []
-    for line in lines:
-        nouns = otk.nouns(line)
+    for nouns in line_nouns:
         if nouns:
             noun_lines.append(" ".join(nouns))
     words = []
@@ -74,15 +82,12 @@ def process_nouns(row):
     words.sort(key=lambda x: x[1], reverse=True)
     words = [w[0] for w in words][:300]
 
-    return [*remain, " ".join(words)]
+    return [*row, " ".join(words)]
 
 
-def process():
-    papers = get_papers()
-    papers.pop(0)
-    docs = []
-    for paper in papers:
-        docs.append(process_nouns(paper))
+@instrument
+def process(processes=None):
+    contexts = (paper.context for paper in get_papers(["context"]))
     with open(
         os.path.join(OUTPUTS_DIR, "word-vector-docs.csv"),
         "w",
@@ -90,71 +95,82 @@ def process():
     ) as f:
         w = csv.writer(f)
         w.writerow(["index", "cate", "year", "title", "context"])
-        for doc in docs:
-            w.writerow(doc)
+        for paper, line_nouns in zip(
+            get_papers(META_COLUMNS), iter_line_nouns(contexts, processes)
+        ):
+            w.writerow(process_nouns(paper, line_nouns))
+            record(rows_in=1, rows_out=1)
 
 
+@instrument
 def write_reindex_raw_data():
+    raw = open_store(NEWS_PAPERS_STORE)
     raw_map = {}
-    with open(os.path.join(OUTPUTS_DIR, "news-papers.csv")) as f:
-        raw = list(csv.reader(f))
-        for r in raw[1:]:
-            raw_map[r[3]] = r
-    ret = [raw[0]]
-
-    with open(os.path.join(OUTPUTS_DIR, "filtered-word-vector-docs.csv")) as f:
-        reader = list(csv.reader(f))
-    for r in reader[1:]:
-        idx, *remain = r
-        ridx, *ra = raw_map[r[3]]
-        ret.append([idx, *ra])
-    with open(
-        os.path.join(OUTPUTS_DIR, "index-raw-papers.csv"),
-        "w",
-        encoding="utf-8",
-    ) as f:
-        w = csv.writer(f)
-        w.writerows(ret)
+    for r in raw.iter_documents(["index", "title"]):
+        raw_map[r.title] = r.index
+
+    def rows():
+        for r in iter_records(
+            os.path.join(OUTPUTS_DIR, "filtered-word-vector-docs.csv"),
+            ["index", "title"],
+        ):
+            ridx, *ra = raw[raw_map[r.title]]
+            record(rows_in=1, rows_out=1)
+            yield [r.index, *ra]
+
+    write_store(INDEX_RAW_PAPERS_STORE, raw.columns, rows())
+    raw.close()
+
+
+def line_term_stats(noun_lines):
+    vocabulary = {}
+    indices = []
+    indptr = [0]
+    for line in noun_lines:
+        for noun in line.split():
+            indices.append(vocabulary.setdefault(noun, len(vocabulary)))
+        indptr.append(len(indices))
+    total_docs_count = len(noun_lines)
+    if not vocabulary:
+        return [], [], [], []
+    matrix = csr_matrix(
+        (np.ones(len(indices), dtype=np.int64), indices, indptr),
+        shape=(total_docs_count, len(vocabulary)),
+    )
+    matrix.sum_duplicates()
+    tf = np.asarray(matrix.sum(axis=0)).ravel()
+    df = np.bincount(matrix.indices, minlength=len(vocabulary))
+    # math.log keeps the idf column bit-identical to the per-word loop.
+    idf = [log(v) for v in (total_docs_count / (df + 1)).tolist()]
+    df = (df / total_docs_count).tolist()
+    return list(vocabulary), tf.tolist(), df, idf
 
 
-def write_td_idf_by_doc():
-    papers = get_papers()[1:]
+@instrument
+def write_td_idf_by_doc(processes=None):
     f = open(
         os.path.join(OUTPUTS_DIR, "tf-df-idf.csv"), "w", encoding="utf-8",
     )
     writer = csv.writer(f)
     writer.writerow(["doc_index", "word", "tf", "df", "idf"])
-    for paper in papers:
-        idx, *_, context = paper
-        lines = context.split("\n")
+    contexts = (paper.context for paper in get_papers(["context"]))
+    for paper, line_nouns in zip(
+        get_papers(["index"]), iter_line_nouns(contexts, processes)
+    ):
+        idx = paper.index
         noun_lines = []
-        for line in lines:
-            nouns = otk.nouns(line)
+        for nouns in line_nouns:
             if nouns:
                 noun_lines.append(" ".join(nouns))
-        total_docs_count = len(noun_lines)
-        words_set = set()
-        for line in noun_lines:
-            nouns = line.split()
-            for noun in nouns:
-                words_set.add(noun)
-        for word in words_set:
-            tf = 0
-            df = 0
-            for li in noun_lines:
-                target_nouns = li.split()
-                temp_tf_count = target_nouns.count(word)
-                tf += temp_tf_count
-                if temp_tf_count > 0:
-                    df += 1
-            idf = log(total_docs_count / (df + 1))
-            df = df / total_docs_count
-            row = [idx, word, tf, df, idf]
-            writer.writerow(row)
+        words, tf, df, idf = line_term_stats(noun_lines)
+        for row in zip(words, tf, df, idf):
+            writer.writerow([idx, *row])
+        record(rows_in=1, rows_out=len(words))
         print(idx)
     f.close()
 
 
+@instrument
 def write_word_count_by_doc():
     f = open(
         os.path.join(OUTPUTS_DIR, "word-count-by-doc.csv"),
@@ -171,6 +187,7 @@ def write_word_count_by_doc():
             doc_index, word, count, *_ = line
 
             writer.writerow([doc_index, word, count])
+            record(rows_in=1, rows_out=1)
     f.close()
 
 
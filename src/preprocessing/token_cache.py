@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+from src.config.settings import TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_PATH
+
+PRUNE_INTERVAL = 10000
+SQLITE_MAX_VARIABLES = 900
+# Hits refresh ``accessed`` only when it is older than this many seconds.
+TOUCH_INTERVAL = 3600
+
+pending_writes = defaultdict(int)
+pending_touches = defaultdict(dict)
+
+
+def open_cache(path=TOKEN_CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS tokens ("
+        "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS tokens_accessed ON tokens (accessed)"
+    )
+    return conn
+
+
+def make_key(version, text):
+    digest = hashlib.sha1()
+    digest.update(version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_many(conn, keys):
+    """
+    Cached values of ``keys`` that are present.
+
+    Lookups stay read-only: hits whose access time is stale are only
+    buffered and written with the next ``put_many`` or ``close_cache``, or
+    once the buffer holds PRUNE_INTERVAL keys.
+    """
+    found = {}
+    keys = list(set(keys))
+    now = time.time()
+    touches = pending_touches[conn]
+    for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+        chunk = keys[i : i + SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            "SELECT key, value, accessed FROM tokens "
+            f"WHERE key IN ({placeholders})",
+            chunk,
+        )
+        for key, value, accessed in rows:
+            found[key] = json.loads(value)
+            if accessed < now - TOUCH_INTERVAL:
+                touches[key] = now
+    if len(touches) >= PRUNE_INTERVAL:
+        write(conn, [touch_statement(conn)])
+    return found
+
+
+def touch_statement(conn):
+    touches = pending_touches.pop(conn, {})
+    return (
+        "UPDATE tokens SET accessed = ? WHERE key = ?",
+        [(accessed, key) for key, accessed in touches.items()],
+    )
+
+
+def put_many(conn, items, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+    if not items:
+        if pending_touches.get(conn):
+            write(conn, [touch_statement(conn)])
+        return
+    now = time.time()
+    write(
+        conn,
+        [
+            touch_statement(conn),
+            (
+                "INSERT OR REPLACE INTO tokens (key, value, accessed) "
+                "VALUES (?, ?, ?)",
+                [
+                    (key, json.dumps(value, ensure_ascii=False), now)
+                    for key, value in items.items()
+                ],
+            ),
+        ],
+    )
+    pending_writes[conn] += len(items)
+    if pending_writes[conn] >= PRUNE_INTERVAL:
+        prune(conn, max_entries)
+
+
+def prune(conn, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+    write(
+        conn,
+        [
+            touch_statement(conn),
+            (
+                "DELETE FROM tokens WHERE key IN ("
+                "SELECT key FROM tokens ORDER BY accessed DESC "
+                "LIMIT -1 OFFSET ?)",
+                [(max_entries,)],
+            ),
+        ],
+    )
+    pending_writes[conn] = 0
+
+
+def close_cache(conn, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+    """
+    Write buffered access times, prune the table down to ``max_entries``
+    if it grew past it, and close ``conn``.
+    """
+    (count,) = conn.execute("SELECT COUNT(*) FROM tokens").fetchone()
+    if count > max_entries:
+        prune(conn, max_entries)
+    elif pending_touches.get(conn):
+        write(conn, [touch_statement(conn)])
+    pending_writes.pop(conn, None)
+    conn.close()
+
+
+def write(conn, statements):
+    # BEGIN IMMEDIATE takes the write lock up front; concurrent writers
+    # wait on the connection timeout instead of failing mid-transaction.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for sql, params in statements:
+            conn.executemany(sql, params)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
@@ -0,0 +1,112 @@
+import multiprocessing
+from itertools import islice
+from multiprocessing.util import Finalize
+
+from src.preprocessing.token_cache import (
+    close_cache,
+    get_many,
+    make_key,
+    open_cache,
+    put_many,
+)
+
+BATCH_SIZE = 32
+okt = None
+cache = None
+tokenizer_version = None
+
+
+def init_worker(use_cache=True):
+    global cache
+    if use_cache:
+        cache = open_cache()
+        # Runs when the worker exits after pool.close(), not on terminate().
+        Finalize(None, close_cache, args=(cache,), exitpriority=10)
+
+
+def get_okt():
+    global okt
+    if okt is None:
+        from konlpy.tag import Okt
+
+        okt = Okt()
+    return okt
+
+
+def get_tokenizer_version():
+    # konlpy is imported on first use so importing this module stays light.
+    global tokenizer_version
+    if tokenizer_version is None:
+        import konlpy
+
+        tokenizer_version = f"konlpy-{konlpy.__version__}/Okt.nouns"
+    return tokenizer_version
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def nouns_batch(texts):
+    if cache is None:
+        return [get_okt().nouns(text) for text in texts]
+    version = get_tokenizer_version()
+    keys = [make_key(version, text) for text in texts]
+    found = get_many(cache, keys)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = get_okt().nouns(text)
+    put_many(cache, missing)
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def line_nouns_batch(texts):
+    splits = [text.split("\n") for text in texts]
+    nouns = iter(nouns_batch([line for lines in splits for line in lines]))
+    return [[next(nouns) for _ in lines] for lines in splits]
+
+
+def stream(
+    worker, texts, processes=None, batch_size=BATCH_SIZE, use_cache=True
+):
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(
+        processes=processes, initializer=init_worker, initargs=(use_cache,)
+    )
+    try:
+        for result in pool.imap(worker, batched(texts, batch_size)):
+            yield from result
+        # Let the workers exit on their own so they flush and prune the
+        # cache before closing it.
+        pool.close()
+        pool.join()
+    finally:
+        pool.terminate()
+
+
+def iter_nouns(texts, processes=None, batch_size=BATCH_SIZE, use_cache=True):
+    """
+    Yield ``okt.nouns(text)`` for every text, in input order.
+
+    Each pool worker starts its own Okt (and JVM) lazily and tokenizes whole
+    batches, so ``texts`` may be a lazy iterator over a large corpus. Results
+    are looked up in and written back to the shared on-disk token cache, so
+    a worker only starts the JVM when it meets a text it has not seen.
+    """
+    return stream(nouns_batch, texts, processes, batch_size, use_cache)
+
+
+def iter_line_nouns(
+    texts, processes=None, batch_size=BATCH_SIZE, use_cache=True
+):
+    """
+    Yield, for every text, the list of ``okt.nouns`` of each of its lines.
+    """
+    return stream(line_nouns_batch, texts, processes, batch_size, use_cache)
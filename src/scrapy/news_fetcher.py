@@ -0,0 +1,238 @@
+import asyncio
+import csv
+import functools
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config.settings import DATA_DIR
+
+BASE_URL = "https://www.bigkinds.or.kr"
+SEARCH_PATH = "/api/news/search.do"
+DETAIL_PATH = "/news/detailView.do"
+NEWS_CONTENT_PATH = os.path.join(DATA_DIR, "scrapy", "news-content.csv")
+FETCH_STATE_PATH = os.path.join(DATA_DIR, "scrapy", "news-fetch-state.json")
+HEADER = ["index", "year", "title", "context"]
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 1
+# 미래 학교 교육, 1995-01-01 부터 2020-12-12, 칼럼/기고문/기고/사설/논설
+SEARCH_QUERY = {
+    "indexName": "news",
+    "searchKey": "미래 AND 학교 AND 교육 AND 예측",
+    "startDate": "1995-01-01",
+    "endDate": "2020-12-12",
+    "editorialIs": True,
+    "categoryCodes": [],
+    "sortMethod": "date",
+}
+
+
+class RateLimiter:
+    """
+    Spaces request starts at least ``1 / rate`` seconds apart.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_start = 0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def make_session(pool_size):
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0"
+    return session
+
+
+def load_state(path=FETCH_STATE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(state, path=FETCH_STATE_PATH):
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def to_text(html):
+    text = re.sub(r"<br\s*/?>", "\n", html or "")
+    return re.sub(r"<[^>]+>", "", text).strip()
+
+
+def parse_search(body):
+    return [item["NEWS_ID"] for item in body.get("resultList") or []]
+
+
+def parse_detail(body):
+    detail = body["detail"]
+    date = re.sub(r"\D", "", str(detail.get("DATE", "")))
+    return date[:4], detail["TITLE"], to_text(detail.get("CONTENT"))
+
+
+async def call(session, limiter, semaphore, method, url, **kwargs):
+    async with semaphore:
+        await limiter.wait()
+        response = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                session.request, method, url, timeout=30, **kwargs
+            ),
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_detail(session, limiter, semaphore, base_url, news_id):
+    body = await call(
+        session,
+        limiter,
+        semaphore,
+        "GET",
+        base_url + DETAIL_PATH,
+        params={"docId": news_id, "returnCnt": 1, "sectionDiv": 1000},
+    )
+    return parse_detail(body)
+
+
+async def fetch_pages(
+    base_url, query, concurrency, rate, page_size, max_pages, path, state_path
+):
+    state = load_state(state_path)
+    if state is None or not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            csv.writer(f).writerow(HEADER)
+        state = {
+            "page": 1,
+            "index": 1,
+            "ids": [],
+            "failed": [],
+            "size": os.path.getsize(path),
+        }
+    else:
+        # Rows written after the last checkpoint are fetched again.
+        os.truncate(path, state["size"])
+    fetched = set(state["ids"])
+    session = make_session(concurrency)
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(concurrency)
+    )
+
+    with open(path, "a", encoding="utf-8") as f:
+        w = csv.writer(f)
+        while max_pages is None or state["page"] <= max_pages:
+            body = await call(
+                session,
+                limiter,
+                semaphore,
+                "POST",
+                base_url + SEARCH_PATH,
+                json={
+                    **query,
+                    "startNo": state["page"],
+                    "resultNumber": page_size,
+                },
+            )
+            ids = parse_search(body)
+            if not ids:
+                break
+            ids = list(dict.fromkeys(ids))
+            ids = [news_id for news_id in ids if news_id not in fetched]
+            details = await asyncio.gather(
+                *[
+                    fetch_detail(
+                        session, limiter, semaphore, base_url, news_id
+                    )
+                    for news_id in ids
+                ],
+                return_exceptions=True,
+            )
+            for news_id, detail in zip(ids, details):
+                if isinstance(detail, Exception):
+                    # Skipped for good, so one dead article cannot stall
+                    # every resume on this page.
+                    print("failed", news_id, repr(detail))
+                    state.setdefault("failed", []).append(news_id)
+                    continue
+                year, title, context = detail
+                w.writerow([state["index"], year, title, context])
+                print(state["index"], year, title)
+                state["index"] += 1
+                state["ids"].append(news_id)
+                fetched.add(news_id)
+            f.flush()
+            state["page"] += 1
+            state["size"] = os.path.getsize(path)
+            save_state(state, state_path)
+    session.close()
+    return state
+
+
+def fetch_news(
+    base_url=BASE_URL,
+    query=SEARCH_QUERY,
+    concurrency=8,
+    rate=5,
+    page_size=100,
+    max_pages=None,
+    path=NEWS_CONTENT_PATH,
+    state_path=FETCH_STATE_PATH,
+):
+    """
+    Page through the BigKinds search results and append every article not
+    fetched before to ``news-content.csv``.
+
+    Article bodies are fetched with up to ``concurrency`` requests in flight
+    on one pooled session, and no more than ``rate`` requests start per
+    second. After each page the next page, the next index, the fetched ids
+    and the file size are checkpointed, so an interrupted crawl resumes at
+    the page it stopped on. Articles that still fail after the session's
+    retries are logged, listed under ``failed`` in the state and skipped.
+    ``base_url`` can point at a local stand-in.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return asyncio.run(
+        fetch_pages(
+            base_url,
+            query,
+            concurrency,
+            rate,
+            page_size,
+            max_pages,
+            path,
+            state_path,
+        )
+    )
+
+
+if __name__ == "__main__":
+    fetch_news()
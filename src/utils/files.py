@@ -0,0 +1,26 @@
+import hashlib
+import os
+
+
+def hash_file(path, files, key=None):
+    """
+    SHA-1 of the file at ``path``, memoized in ``files`` under ``key``
+    (``path`` by default) by size and mtime.
+    """
+    key = key or path
+    stat = os.stat(path)
+    known = files.get(key)
+    if known and known["size"] == stat.st_size and (
+        known["mtime"] == stat.st_mtime_ns
+    ):
+        return known["sha1"]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    files[key] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha1": digest.hexdigest(),
+    }
+    return files[key]["sha1"]
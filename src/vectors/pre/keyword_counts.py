@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+from src.config.settings import OUTPUTS_DIR
+from src.corpus.store import INDEX_RAW_PAPERS_STORE, open_store
+from src.pipelines.instrument import instrument, record
+from src.vectors.pre.keyword_matcher import (
+    build_matcher,
+    count_keywords,
+    lexicon_keywords,
+)
+
+KEYWORD_COUNTS_PATH = os.path.join(OUTPUTS_DIR, "keyword-counts.npz")
+
+KeywordCounts = namedtuple("KeywordCounts", ["counts", "keywords", "index"])
+
+
+def store_fingerprint(path):
+    stat = os.stat(f"{path}.docs")
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def init_count_worker(path, keywords):
+    global worker_store, worker_keywords, worker_matcher
+    worker_store = open_store(path)
+    worker_keywords = keywords
+    worker_matcher = build_matcher(keywords)
+
+
+def count_row(key):
+    counts = count_keywords(worker_matcher, worker_store.text(key))
+    return [
+        (column, counts[keyword])
+        for column, keyword in enumerate(worker_keywords)
+        if counts[keyword]
+    ]
+
+
+def count_matrix(path, keys, keywords, processes=None):
+    """
+    Sparse ``len(keys) x len(keywords)`` matrix of keyword counts in the
+    documents of the store at ``path``, counted in a process pool.
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    if keywords:
+        with multiprocessing.Pool(
+            processes,
+            initializer=init_count_worker,
+            initargs=(path, keywords),
+        ) as pool:
+            for row in pool.imap(count_row, keys, chunksize=64):
+                for column, count in row:
+                    indices.append(column)
+                    data.append(count)
+                indptr.append(len(indices))
+    else:
+        indptr *= len(keys) + 1
+    return sparse.csr_matrix(
+        (
+            np.array(data, dtype=np.int32),
+            np.array(indices, dtype=np.int32),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(keys), len(keywords)),
+    )
+
+
+def save_keyword_counts(counts, fingerprint):
+    matrix = counts.counts.tocsr()
+    np.savez(
+        f"{KEYWORD_COUNTS_PATH}.tmp.npz",
+        data=matrix.data,
+        indices=matrix.indices,
+        indptr=matrix.indptr,
+        shape=np.array(matrix.shape),
+        keywords=np.array(counts.keywords, dtype=str),
+        index=np.asarray(counts.index, dtype=np.int64),
+        fingerprint=fingerprint,
+    )
+    os.replace(f"{KEYWORD_COUNTS_PATH}.tmp.npz", KEYWORD_COUNTS_PATH)
+
+
+def load_keyword_counts(with_fingerprint=False):
+    with np.load(KEYWORD_COUNTS_PATH) as data:
+        counts = KeywordCounts(
+            sparse.csr_matrix(
+                (data["data"], data["indices"], data["indptr"]),
+                shape=tuple(data["shape"]),
+            ),
+            data["keywords"].tolist(),
+            data["index"],
+        )
+        fingerprint = data["fingerprint"]
+    return (counts, fingerprint) if with_fingerprint else counts
+
+
+@instrument
+def write_keyword_counts(morphs, processes=None):
+    """
+    Persist the document x keyword count matrix of the raw paper store.
+
+    When the store is unchanged since the last run only keywords that are
+    not in the matrix yet are counted, so editing weights or adding a
+    lexicon does not rescan the corpus.
+    """
+    keywords = list(dict.fromkeys(lexicon_keywords(morphs)))
+    fingerprint = store_fingerprint(INDEX_RAW_PAPERS_STORE)
+    with open_store(INDEX_RAW_PAPERS_STORE) as store:
+        keys = list(store.keys())
+    try:
+        known, known_fingerprint = load_keyword_counts(with_fingerprint=True)
+    except FileNotFoundError:
+        known = None
+    if known is None or not np.array_equal(known_fingerprint, fingerprint):
+        known = KeywordCounts(
+            sparse.csr_matrix((len(keys), 0), dtype=np.int32), [], keys
+        )
+    counted = set(known.keywords)
+    missing = [k for k in keywords if k not in counted]
+    counts = sparse.hstack(
+        [
+            known.counts,
+            count_matrix(INDEX_RAW_PAPERS_STORE, keys, missing, processes),
+        ],
+        format="csr",
+    )
+    record(rows_in=len(keys) if missing else 0, rows_out=len(keys))
+    print(f"{len(missing)} of {len(keywords)} keywords counted")
+    save_keyword_counts(
+        KeywordCounts(counts, known.keywords + missing, keys), fingerprint
+    )
+
+
+def weight_matrix(morphs, keywords, weighted=True):
+    """
+    ``len(keywords) x len(morphs)`` matrix whose column ``j`` holds, per
+    keyword, the summed weights of the distinct ``(keyword, weight)``
+    entries of the ``j``-th lexicon, or their number if not ``weighted``.
+    """
+    columns = {keyword: i for i, keyword in enumerate(keywords)}
+    matrix = np.zeros((len(keywords), len(morphs)))
+    for j, value in enumerate(morphs.values()):
+        for keyword, weight in set(value):
+            matrix[columns[keyword], j] += float(weight) if weighted else 1
+    return matrix
+
+
+def document_rows(counts, indexes):
+    """
+    Rows of ``counts`` for the document ``indexes``, in that order.
+    """
+    indexes = np.asarray(indexes, dtype=np.int64)
+    positions = np.searchsorted(counts.index, indexes)
+    positions = np.minimum(positions, len(counts.index) - 1)
+    if len(indexes) and not np.array_equal(
+        counts.index[positions], indexes
+    ):
+        missing = indexes[counts.index[positions] != indexes]
+        raise KeyError(f"documents missing from keyword counts: {missing}")
+    return counts.counts[positions]
+
+
+def lexicon_scores(counts, indexes, morphs, weighted=True):
+    """
+    Per-document totals of every lexicon as one ``docs x lexicons`` array.
+    """
+    return np.asarray(
+        document_rows(counts, indexes)
+        @ weight_matrix(morphs, counts.keywords, weighted)
+    )
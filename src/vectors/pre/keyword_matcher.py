@@ -0,0 +1,65 @@
+from collections import deque
+
+
+def build_matcher(keywords):
+    keywords = list(dict.fromkeys(k for k in keywords if k))
+    goto = [{}]
+    fail = [0]
+    outputs = [[]]
+    for pid, keyword in enumerate(keywords):
+        node = 0
+        for char in keyword:
+            nxt = goto[node].get(char)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][char] = nxt
+                goto.append({})
+                fail.append(0)
+                outputs.append([])
+            node = nxt
+        outputs[node].append(pid)
+
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for char, nxt in goto[node].items():
+            queue.append(nxt)
+            f = fail[node]
+            while f and char not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(char, 0)
+            outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+    lengths = [len(k) for k in keywords]
+    return keywords, goto, fail, outputs, lengths
+
+
+def count_keywords(matcher, text):
+    """
+    Count every keyword of ``matcher`` in one pass over ``text``.
+
+    Counts follow ``str.count`` semantics: occurrences of the same keyword
+    never overlap, while different keywords may share characters.
+    """
+    keywords, goto, fail, outputs, lengths = matcher
+    counts = [0] * len(keywords)
+    last_end = [0] * len(keywords)
+    node = 0
+    for pos, char in enumerate(text, 1):
+        while node and char not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(char, 0)
+        for pid in outputs[node]:
+            if pos - lengths[pid] >= last_end[pid]:
+                counts[pid] += 1
+                last_end[pid] = pos
+    ret = dict(zip(keywords, counts))
+    ret[""] = len(text) + 1
+    return ret
+
+
+def lexicon_keywords(morphs):
+    keywords = []
+    for value in morphs.values():
+        for item in value:
+            keywords.append(item[0] if isinstance(item, tuple) else item)
+    return keywords
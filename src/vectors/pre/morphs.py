@@ -1,17 +1,21 @@
+import base64
 import csv
-import math
+import hashlib
+import json
+import multiprocessing
 import os
 import pickle
 import sys
-from collections import defaultdict, OrderedDict
+from collections import OrderedDict
 from itertools import combinations
+from multiprocessing.util import Finalize
 from random import randint
 
 import numpy as np
 import pandas as pd
 from bokeh.core.property.dataspec import value
 from bokeh.io import show
-from bokeh.io.export import export_svg, export_png
+from bokeh.io.export import export_svg
 from bokeh.models import (
     ColumnDataSource,
     HoverTool,
@@ -22,8 +26,16 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from sklearn.manifold import TSNE
 
-from src.config.settings import DATA_DIR, OUTPUTS_DIR, BASE_DIR
-from src.preprocessing.cluster import min_max_normalize, read_word_vector_docs
+from src.charts.raster import scatter_png
+from src.config.settings import CACHE_DIR, DATA_DIR, OUTPUTS_DIR, BASE_DIR
+from src.corpus.reader import iter_documents
+from src.pipelines.instrument import instrument, record
+from src.preprocessing.cluster import read_word_vector_docs
+from src.preprocessing.normalize import min_max_columns
+from src.vectors.pre.keyword_counts import (
+    lexicon_scores,
+    load_keyword_counts,
+)
 
 format_string = "{}. {}_result.csv"
 options = Options()
@@ -32,6 +44,14 @@ MORPHS_PATH = os.path.join(DATA_DIR, "morphs")
 KEYWORD_PATH = os.path.join(DATA_DIR, "keywords")
 
 FUTURES_PATH = os.path.join(DATA_DIR, "futures")
+CLUSTER_COLUMNS = [
+    "index",
+    "cate",
+    "year",
+    "title",
+    "cluster",
+    "distance_from_cluster",
+]
 
 csv.field_size_limit(sys.maxsize)
 
@@ -43,8 +63,11 @@ def standard(arr):
 
 
 def get_cluster_data():
-    with open(os.path.join(OUTPUTS_DIR, "cluster-docs.csv")) as f:
-        return list(csv.reader(f))[1:]
+    return list(
+        iter_documents(
+            os.path.join(OUTPUTS_DIR, "cluster-docs.csv"), CLUSTER_COLUMNS
+        )
+    )
 
 
 def get_data(path):
@@ -86,170 +109,184 @@ def get_data(path):
     return ret
 
 
-def get_raw_content():
-    with open(
-        os.path.join(OUTPUTS_DIR, "index-raw-papers.csv"), encoding="utf-8",
-    ) as f:
-        raw_data = list(csv.reader(f))
-    return raw_data
+def vector_header(morphs):
+    keys = list(morphs.keys())
+    return [f"{keys[i]} | {keys[i + 1]}" for i in range(0, len(keys), 2)]
 
 
+@instrument
 def export_vectors(morphs, cluster_data):
-    raw_data = get_raw_content()
-    keys = list(morphs.keys())
-    vector_header = []
-    for i in range(0, len(keys), 2):
-        vector_header.append(f"{keys[i]} | {keys[i + 1]}")
-    header = ["index", "cate", "year", "title", "cluster", *vector_header]
-    ret = [header]
-    for item in cluster_data:
-        idx, *remain, context, cluster, distance = item
-        raw = raw_data[int(idx)][4]
-
-        temp = []
-        for key, value in morphs.items():
-            total = 0.0
-            keywords = set(item for item in value)
-            for k, weight in keywords:
-                if isinstance(weight, str):
-                    weight = float(weight)
-                c = raw.count(k)
-                v = weight * c
-                total += v
-            temp.append(math.sqrt(math.sqrt(total)))
-
-        merge = []
-
-        for i in range(0, len(temp), 2):
-            diff = temp[i + 1] - temp[i]
-
-            merge.append(diff)
-        ret.append([idx, *remain, cluster, *merge])
+    """
+    Score every document on each pair of lexicons from the persisted
+    keyword count matrix: the fourth root of the weighted keyword count of
+    the second lexicon minus that of the first.
+    """
+    counts = load_keyword_counts()
+    indexes = [item.index for item in cluster_data]
+    scores = np.sqrt(np.sqrt(lexicon_scores(counts, indexes, morphs)))
+    vectors = scores[:, 1::2] - scores[:, 0::2]
+    header = ["index", "cate", "year", "title", "cluster"]
+    record(rows_in=len(cluster_data), rows_out=len(cluster_data))
     with open(os.path.join(OUTPUTS_DIR, "future_vectors_raw.csv"), "w") as f:
-        reader = csv.writer(f)
-        reader.writerows(ret)
+        w = csv.writer(f)
+        w.writerow([*header, *vector_header(morphs)])
+        for item, vector in zip(cluster_data, vectors.tolist()):
+            idx, *remain, cluster, distance = item
+            w.writerow([idx, *remain, cluster, *vector])
 
 
+@instrument
 def export_vectors2(morphs, cluster_data):
-    raw_data = get_raw_content()
-    keys = list(morphs.keys())
-    vector_header = []
-    for i in range(0, len(keys), 2):
-        vector_header.append(f"{keys[i]} | {keys[i + 1]}")
-    header = ["index", "cate", "year", "title", "cluster", *vector_header]
-    ret = [header]
-    extra = [[] for _ in range(len(keys))]
-    for item in cluster_data:
-        idx, *remain, context, cluster, distance = item
-        raw = raw_data[int(idx)][4]
-        for i, r in enumerate(morphs.items()):
-            key, value = r
-            total = 0
-            keywords = set(item for item in value)
-            for k in keywords:
-                total += raw.count(k)
-            # v = math.sqrt(math.sqrt(total))
-            extra[i].append(total)
-    for i in range(len(extra)):
-        extra[i] = min_max_normalize(extra[i])
-    for item in cluster_data:
-        idx, *remain, context, cluster, distance = item
-        temp = []
-        for i in range(0, len(keys), 2):
-            v1 = extra[i][int(idx) - 1]
-            v2 = extra[i + 1][int(idx) - 1]
-            temp.append(v2 - v1)
-        ret.append([idx, *remain, cluster, *temp])
+    counts = load_keyword_counts()
+    indexes = [item.index for item in cluster_data]
+    totals = lexicon_scores(counts, indexes, morphs, weighted=False)
+    extra = min_max_columns(totals)
+    vectors = extra[:, 1::2] - extra[:, 0::2]
+    header = ["index", "cate", "year", "title", "cluster"]
+    record(rows_in=len(cluster_data), rows_out=len(cluster_data))
     with open(
         os.path.join(OUTPUTS_DIR, "normalized_future_vectors.csv"), "w"
     ) as f:
-        reader = csv.writer(f)
-        reader.writerows(ret)
+        w = csv.writer(f)
+        w.writerow([*header, *vector_header(morphs)])
+        for item, vector in zip(cluster_data, vectors.tolist()):
+            idx, *remain, cluster, distance = item
+            w.writerow([idx, *remain, cluster, *vector])
 
 
+@instrument
 def export_normalized_future_vectors(is_divide=False):
+    """
+    Rescale every future vector column to [-1, 1].
+
+    With ``is_divide`` positive and negative scores are min-max scaled
+    separately, to [0, 1] and [-1, 0], so the sign of a score survives;
+    otherwise the whole column is scaled linearly.
+    """
     with open(os.path.join(OUTPUTS_DIR, "future_vectors_raw.csv")) as f:
-        reader = list(csv.reader(f))
-    ret = [[] for _ in range(len(reader[0]) - 5)]
-    for row in reader[1:]:
-        _, _, _, _, _, *count = row
-        for idx, v in enumerate(count):
-            ret[idx].append(float(v))
-    normals = []
+        reader = csv.reader(f)
+        header = next(reader)
+        meta = []
+        values = []
+        for row in reader:
+            meta.append(row[:5])
+            values.append(row[5:])
+    values = np.array(values, dtype=float).reshape(len(meta), -1)
     if is_divide:
-        for idx, r in enumerate(ret):
-            df = pd.DataFrame({"value": r})
-            positive = min_max_normalize(df.loc[df.value >= 0].value.to_list())
-            negative = min_max_normalize(df.loc[df.value < 0].value.to_list())
-            df.loc[df.value >= 0, "value"] = positive
-            df.loc[df.value < 0, "value"] = [-1 + n for n in negative]
-
-            normals.append(df.value.to_list())
+        positive = values >= 0
+        negative = values < 0
+        normals = np.where(
+            positive,
+            min_max_columns(values, positive),
+            np.where(
+                negative, min_max_columns(values, negative) - 1, values
+            ),
+        )
     else:
-        for r in ret:
-            temp = min_max_normalize(r)
-            normals.append([(t - 0.5) * 2 for t in temp])
-    data = [reader[0]]
-    for idx, row in enumerate(reader[1:]):
-        temp = []
-        for i in range(len(row) - 5):
-            temp.append(normals[i][idx])
-        data.append(row[:5] + temp)
+        normals = (min_max_columns(values) - 0.5) * 2
+    record(rows_in=len(meta), rows_out=len(meta))
     with open(
         os.path.join(OUTPUTS_DIR, "normalized_future_vectors.csv"), "w"
     ) as f:
-        reader = csv.writer(f)
-        reader.writerows(data)
+        w = csv.writer(f)
+        w.writerow(header)
+        for row, normal in zip(meta, normals.tolist()):
+            w.writerow(row + normal)
+
+
+REDUCTIONS = {
+    "mean": lambda group: group.mean(axis=0),
+    "median": lambda group: np.median(group, axis=0),
+    "std": lambda group: group.std(axis=0),
+    "count": lambda group: np.full(group.shape[1], len(group)),
+}
+
+
+def grouped_reductions(values, keys, reductions=("mean",)):
+    """
+    Reduce the rows of ``values`` that share a key, for every column at
+    once.
+
+    Rows are sorted by key a single time and each group is reduced as one
+    contiguous block; returns the sorted distinct keys and, per reduction
+    name in ``REDUCTIONS``, a ``groups x columns`` array.
+    """
+    groups, labels = np.unique(keys, return_inverse=True)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(len(groups) + 1))
+    values = values[order]
+    ret = {}
+    for name in reductions:
+        reduce = REDUCTIONS[name]
+        ret[name] = np.array(
+            [
+                reduce(values[start:end])
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]
+        ).reshape(len(groups), values.shape[1])
+    return groups.tolist(), ret
 
 
+@instrument
 def export_normalized_future_cluster_vectors(
-    filename="normalized_future_vectors.csv",
+    filename="normalized_future_vectors.csv", reductions=("mean",)
 ):
-
-    clusters = set()
+    """
+    Year-weighted per-cluster aggregates of every future vector: a score
+    from year y counts ``(y - 1994) / 26`` times. The mean goes to
+    ``normalized_future_cluster_vectors.csv``; any further ``reductions``
+    (median, std, count) are written next to it with the name appended.
+    """
     with open(os.path.join(OUTPUTS_DIR, filename)) as f:
-        reader = list(csv.reader(f))
-    for row in reader[1:]:
-        clusters.add(row[4])
-    clusters = list(clusters)
-    clusters.sort()
+        reader = csv.reader(f)
+        origin_header = next(reader)
+        clusters = []
+        years = []
+        values = []
+        for row in reader:
+            clusters.append(row[4])
+            years.append(row[2])
+            values.append(row[5:])
+    values = np.array(values, dtype=float).reshape(len(clusters), -1)
+    weighted = values * (np.array(years, dtype=int) - 1994)[:, None] / 26
+    clusters, results = grouped_reductions(
+        weighted, clusters, dict.fromkeys(("mean", *reductions))
+    )
     header = ["index", "미래벡터", *clusters]
-    origin_header = reader[0]
-    ret = [header]
-    for i, idx in enumerate(range(5, len(origin_header))):
-        temp = [i, origin_header[idx]]
-        dic = defaultdict(list)
-        for row in reader[1:]:
-            dic[row[4]].append(float(row[idx]) * (int(row[2]) - 1994) / 26)
-        for key in dic.keys():
-            dic[key] = sum(dic[key]) / len(dic[key])
-        for c in clusters:
-            temp.append(dic[c])
-        ret.append(temp)
-
-    # ret.insert(0, ["cluster", *reader[0][5:]])
-    with open(
-        os.path.join(OUTPUTS_DIR, "normalized_future_cluster_vectors.csv"), "w"
-    ) as f:
-        w = csv.writer(f)
-        w.writerows(ret)
-    with open(
-        os.path.join(
-            OUTPUTS_DIR, "normalized_future_cluster_vectors_euckr.csv"
-        ),
-        "w",
-        encoding="euc-kr",
-    ) as f:
-        w = csv.writer(f)
-        w.writerows(ret)
-
-
+    record(rows_in=len(values), rows_out=len(origin_header) - 5)
+    for name, result in results.items():
+        ret = [header]
+        for i, vector in enumerate(origin_header[5:]):
+            ret.append([i, vector, *result[:, i].tolist()])
+        suffix = "" if name == "mean" else f"_{name}"
+        with open(
+            os.path.join(
+                OUTPUTS_DIR, f"normalized_future_cluster_vectors{suffix}.csv"
+            ),
+            "w",
+        ) as f:
+            w = csv.writer(f)
+            w.writerows(ret)
+        with open(
+            os.path.join(
+                OUTPUTS_DIR,
+                f"normalized_future_cluster_vectors{suffix}_euckr.csv",
+            ),
+            "w",
+            encoding="euc-kr",
+        ) as f:
+            w = csv.writer(f)
+            w.writerows(ret)
+
+
+@instrument
 def export_comb(morphs):
     ret = []
     keys = list(morphs.keys())
     for i in range(0, len(keys), 2):
         ret.append(f"{keys[i]} | {keys[i + 1]}")
     comb = list(combinations(ret, 2))
+    record(rows_out=len(comb))
     with open(os.path.join(OUTPUTS_DIR, "future_comb.csv"), "w") as f:
         w = csv.writer(f)
         w.writerows([("가로축", "세로축"), *enumerate(comb, 1)])
@@ -262,124 +299,300 @@ def export_comb(morphs):
         w.writerows([("가로축", "세로축"), *enumerate(comb, 1)])
 
 
-def draw_vectors():
-    driver = webdriver.Chrome(
-        os.path.join(BASE_DIR, "chromedriver"), options=options
+VECTOR_CHART_STYLE = {
+    "cluster": 3,
+    "colormap": {3: "#ffee33", 2: "#00a152", 1: "#2979ff", 0: "#d500f9"},
+    "size": 1600,
+    "point_size": 20,
+    "alpha": 0.6,
+    "font_size": "25pt",
+    "title_font_size": "32pt",
+    "label_font_size": "30px",
+}
+VECTOR_CHART_FILTER = {
+    (5, 6),
+    (5, 7),
+    (6, 7),
+    (8, 9),
+    (8, 10),
+    (9, 10),
+    (11, 12),
+    (11, 13),
+    (12, 13),
+}
+VECTOR_CHART_STATE_PATH = os.path.join(CACHE_DIR, "vector-charts.json")
+
+
+def vector_chart(df, x, y, style=VECTOR_CHART_STYLE):
+    X = df[df.columns[x]].to_list()
+    Y = df[df.columns[y]].to_list()
+    tsne_df = pd.DataFrame(
+        zip(X, Y), index=range(len(X)), columns=["x_coord", "y_coord"]
     )
-
+    tsne_df["title"] = df["title"].to_list()
+    tsne_df["cluster_no"] = df["cluster"].to_list()
+    colormap = style["colormap"]
+    # colormap = {3: "#bdbdbd", 2: "#bdbdbd", 1: "#bdbdbd", 0: "#d500f9"}
+    # colormap = {3: "#bdbdbd", 2: "#bdbdbd", 1: "#2979ff", 0: "#bdbdbd"}
+    # colormap = {3: "#bdbdbd", 2: "#00a152", 1: "#bdbdbd", 0: "#bdbdbd"}
+    # colormap = {3: "#ffee33", 2: "#bdbdbd", 1: "#bdbdbd", 0: "#bdbdbd"}
+    only_one_cluster = pd.DataFrame(
+        tsne_df.loc[tsne_df.cluster_no == style["cluster"]]
+    )
+    colors = [colormap[x] for x in only_one_cluster["cluster_no"]]
+
+    only_one_cluster["color"] = colors
+    plot_data = ColumnDataSource(data=only_one_cluster.to_dict(orient="list"))
+    plot = figure(
+        # title='TSNE Twitter BIO Embeddings',
+        plot_width=style["size"],
+        plot_height=style["size"],
+        active_scroll="wheel_zoom",
+        output_backend="svg",
+        x_range=(-1.1, 1.1),
+        y_range=(-1.1, 1.1),
+    )
+    plot.add_tools(HoverTool(tooltips="@title"))
+    plot.circle(
+        source=plot_data,
+        x="x_coord",
+        y="y_coord",
+        line_alpha=style["alpha"],
+        fill_alpha=style["alpha"],
+        size=style["point_size"],
+        fill_color="color",
+        line_color="color",
+    )
+    plot.yaxis.axis_label_text_font_size = style["font_size"]
+    plot.yaxis.major_label_text_font_size = style["font_size"]
+    plot.xaxis.axis_label_text_font_size = style["font_size"]
+    plot.xaxis.major_label_text_font_size = style["font_size"]
+    start_x, end_x = df.columns[x].split("|")
+    start_y, end_y = df.columns[y].split("|")
+    start_x = start_x.strip()
+    end_x = end_x.strip()
+    start_y = start_y.strip()
+    end_y = end_y.strip()
+    plot.title.text_font_size = value(style["title_font_size"])
+    plot.xaxis.visible = True
+    # plot.xaxis.bounds = (0, 0)
+    plot.yaxis.visible = True
+    font_size = style["label_font_size"]
+    label_opts1 = dict(x_offset=0, y_offset=750, text_font_size=font_size)
+    msg1 = end_y
+    caption1 = Label(text=msg1, **label_opts1)
+    label_opts2 = dict(x_offset=0, y_offset=-750, text_font_size=font_size)
+    msg2 = start_y
+    caption2 = Label(text=msg2, **label_opts2)
+    label_opts3 = dict(x_offset=600, y_offset=0, text_font_size=font_size)
+    msg3 = end_x
+    caption3 = Label(text=msg3, **label_opts3)
+    label_opts4 = dict(x_offset=-750, y_offset=0, text_font_size=font_size)
+    msg4 = start_x
+    caption4 = Label(text=msg4, **label_opts4)
+    plot.add_layout(caption1, "center")
+    plot.add_layout(caption2, "center")
+    plot.add_layout(caption3, "center")
+    plot.add_layout(caption4, "center")
+    plot.background_fill_color = None
+    plot.border_fill_color = None
+    plot.grid.grid_line_color = None
+    plot.outline_line_color = None
+    plot.yaxis.fixed_location = 0
+    plot.xaxis.fixed_location = 0
+    plot.toolbar.logo = None
+    plot.toolbar_location = None
+    return plot, len(only_one_cluster)
+
+
+def vector_chart_key(df, x, y, style=VECTOR_CHART_STYLE):
+    """
+    Content hash of everything a chart is drawn from.
+    """
+    digest = hashlib.sha1()
+    digest.update(
+        json.dumps(
+            [df.columns[x], df.columns[y], style], sort_keys=True, default=str
+        ).encode("utf-8")
+    )
+    frame = df[[df.columns[x], df.columns[y], "title", "cluster"]]
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values)
+    return digest.hexdigest()
+
+
+# Draws an SVG onto a canvas in the page that is already loaded and returns
+# it as base64 PNG, so the PNG needs no second Bokeh page load.
+SVG_TO_PNG_SCRIPT = """
+const [svg, width, height, done] = arguments;
+const image = new Image();
+image.onload = () => {
+    const canvas = document.createElement("canvas");
+    canvas.width = width;
+    canvas.height = height;
+    canvas.getContext("2d").drawImage(image, 0, 0, width, height);
+    done(canvas.toDataURL("image/png").split(",")[1]);
+};
+image.onerror = () => done(null);
+image.src = "data:image/svg+xml;base64,"
+    + btoa(unescape(encodeURIComponent(svg)));
+"""
+
+
+def init_chart_worker(df):
+    global worker_df, worker_driver
+    worker_df = df
+    worker_driver = None
+
+
+def get_chart_driver():
+    """
+    The worker's headless Chrome, started by its first chart. Starting it
+    here rather than in the pool initializer lets a broken chromedriver
+    fail the task, and so ``draw_vectors``, instead of making the pool
+    respawn workers forever.
+    """
+    global worker_driver
+    if worker_driver is None:
+        worker_driver = webdriver.Chrome(
+            os.path.join(BASE_DIR, "chromedriver"), options=options
+        )
+        # quit the browser when the pool shuts this worker down
+        Finalize(None, worker_driver.quit, exitpriority=10)
+    return worker_driver
+
+
+def svg_to_png(driver, svg_path, png_path, size):
+    with open(svg_path, encoding="utf-8") as f:
+        svg = f.read()
+    data = driver.execute_async_script(SVG_TO_PNG_SCRIPT, svg, size, size)
+    if data is None:
+        raise RuntimeError(f"could not rasterize {svg_path}")
+    with open(png_path, "wb") as f:
+        f.write(base64.b64decode(data))
+
+
+def render_chart(task):
+    idx, x, y = task
+    driver = get_chart_driver()
+    plot, points = vector_chart(worker_df, x, y)
+    export_svg(
+        plot,
+        filename=f"svgs/{idx}.svg",
+        webdriver=driver,
+        height=VECTOR_CHART_STYLE["size"],
+        width=VECTOR_CHART_STYLE["size"],
+    )
+    svg_to_png(
+        driver,
+        f"svgs/{idx}.svg",
+        f"pngs/{idx}.png",
+        VECTOR_CHART_STYLE["size"],
+    )
+    return idx, points
+
+
+def load_vector_chart_state():
+    try:
+        with open(VECTOR_CHART_STATE_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_vector_chart_state(state):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(f"{VECTOR_CHART_STATE_PATH}.tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(f"{VECTOR_CHART_STATE_PATH}.tmp", VECTOR_CHART_STATE_PATH)
+
+
+def raster_vector_chart(df, idx, x, y, style=VECTOR_CHART_STYLE):
+    """
+    Rasterize one axis pair straight to ``pngs/<idx>.png`` with numpy, in
+    the colours and ranges of ``vector_chart`` but without axes or labels.
+    """
+    shown = df.loc[df.cluster == style["cluster"]]
+    colors = list(style["colormap"].values())
+    positions = {cluster: i for i, cluster in enumerate(style["colormap"])}
+    scatter_png(
+        f"pngs/{idx}.png",
+        shown[df.columns[x]].to_numpy(),
+        shown[df.columns[y]].to_numpy(),
+        [positions[cluster] for cluster in shown.cluster],
+        colors,
+        width=style["size"],
+        height=style["size"],
+        x_range=(-1.1, 1.1),
+        y_range=(-1.1, 1.1),
+        radius=style["point_size"] // 2,
+    )
+    return idx, len(shown)
+
+
+@instrument
+def draw_vectors(workers=None, force=False, raster=False):
+    """
+    Render every pair of future vector axes to ``svgs/`` and ``pngs/``.
+
+    Charts are spread over ``workers`` processes that each keep one
+    headless Chrome for the whole run. Bokeh renders each plot once, to
+    SVG, and the PNG is drawn from that SVG in the same page. With
+    ``raster`` only PNGs are written, rasterized in this process without a
+    browser. A chart is skipped when a hash of its
+    two columns, the titles, the clusters, VECTOR_CHART_STYLE and the mode
+    matches the last run and its files still exist.
+    """
     df = pd.read_csv(
         os.path.join(OUTPUTS_DIR, "normalized_future_vectors.csv")
     )
-    filter_list = {
-        (5, 6),
-        (5, 7),
-        (6, 7),
-        (8, 9),
-        (8, 10),
-        (9, 10),
-        (11, 12),
-        (11, 13),
-        (12, 13),
-    }
     comb = list(combinations(range(5, len(df.columns)), 2))
-    comb = [c for c in comb if c not in filter_list]
-    for idx, coord in enumerate(comb, 1):
-        x, y = coord
-        X = df[df.columns[x]].to_list()
-        Y = df[df.columns[y]].to_list()
-        tsne_df = pd.DataFrame(
-            zip(X, Y), index=range(len(X)), columns=["x_coord", "y_coord"]
-        )
-        tsne_df["title"] = df["title"].to_list()
-        tsne_df["cluster_no"] = df["cluster"].to_list()
-        colormap = {3: "#ffee33", 2: "#00a152", 1: "#2979ff", 0: "#d500f9"}
-        # colormap = {3: "#bdbdbd", 2: "#bdbdbd", 1: "#bdbdbd", 0: "#d500f9"}
-        # colormap = {3: "#bdbdbd", 2: "#bdbdbd", 1: "#2979ff", 0: "#bdbdbd"}
-        # colormap = {3: "#bdbdbd", 2: "#00a152", 1: "#bdbdbd", 0: "#bdbdbd"}
-        # colormap = {3: "#ffee33", 2: "#bdbdbd", 1: "#bdbdbd", 0: "#bdbdbd"}
-        only_one_cluster = pd.DataFrame(tsne_df.loc[tsne_df.cluster_no == 3])
-        colors = [colormap[x] for x in only_one_cluster["cluster_no"]]
-
-        only_one_cluster["color"] = colors
-        plot_data = ColumnDataSource(
-            data=only_one_cluster.to_dict(orient="list")
+    comb = [c for c in comb if c not in VECTOR_CHART_FILTER]
+    os.makedirs("svgs", exist_ok=True)
+    os.makedirs("pngs", exist_ok=True)
+    state = load_vector_chart_state()
+    keys = {}
+    tasks = []
+    style = {**VECTOR_CHART_STYLE, "raster": raster}
+    for idx, (x, y) in enumerate(comb, 1):
+        keys[str(idx)] = vector_chart_key(df, x, y, style)
+        if (
+            force
+            or state.get(str(idx)) != keys[str(idx)]
+            or not (raster or os.path.exists(f"svgs/{idx}.svg"))
+            or not os.path.exists(f"pngs/{idx}.png")
+        ):
+            tasks.append((idx, x, y))
+    print(f"{len(tasks)} of {len(comb)} charts to render")
+    if tasks and raster:
+        try:
+            for idx, x, y in tasks:
+                idx, points = raster_vector_chart(df, idx, x, y)
+                state[str(idx)] = keys[str(idx)]
+                record(rows_in=points, rows_out=1)
+        finally:
+            save_vector_chart_state(state)
+    elif tasks:
+        pool = multiprocessing.Pool(
+            min(workers or multiprocessing.cpu_count(), len(tasks)),
+            initializer=init_chart_worker,
+            initargs=(df,),
         )
-        plot = figure(
-            # title='TSNE Twitter BIO Embeddings',
-            plot_width=1600,
-            plot_height=1600,
-            active_scroll="wheel_zoom",
-            output_backend="svg",
-            x_range=(-1.1, 1.1),
-            y_range=(-1.1, 1.1),
-        )
-        plot.add_tools(HoverTool(tooltips="@title"))
-        plot.circle(
-            source=plot_data,
-            x="x_coord",
-            y="y_coord",
-            line_alpha=0.6,
-            fill_alpha=0.6,
-            size=20,
-            fill_color="color",
-            line_color="color",
-        )
-        plot.yaxis.axis_label_text_font_size = "25pt"
-        plot.yaxis.major_label_text_font_size = "25pt"
-        plot.xaxis.axis_label_text_font_size = "25pt"
-        plot.xaxis.major_label_text_font_size = "25pt"
-        start_x, end_x = df.columns[x].split("|")
-        start_y, end_y = df.columns[y].split("|")
-        start_x = start_x.strip()
-        end_x = end_x.strip()
-        start_y = start_y.strip()
-        end_y = end_y.strip()
-        plot.title.text_font_size = value("32pt")
-        plot.xaxis.visible = True
-        # plot.xaxis.bounds = (0, 0)
-        plot.yaxis.visible = True
-        label_opts1 = dict(x_offset=0, y_offset=750, text_font_size="30px",)
-        msg1 = end_y
-        caption1 = Label(text=msg1, **label_opts1)
-        label_opts2 = dict(x_offset=0, y_offset=-750, text_font_size="30px",)
-        msg2 = start_y
-        caption2 = Label(text=msg2, **label_opts2)
-        label_opts3 = dict(x_offset=600, y_offset=0, text_font_size="30px",)
-        msg3 = end_x
-        caption3 = Label(text=msg3, **label_opts3)
-        label_opts4 = dict(x_offset=-750, y_offset=0, text_font_size="30px",)
-        msg4 = start_x
-        caption4 = Label(text=msg4, **label_opts4)
-        plot.add_layout(caption1, "center")
-        plot.add_layout(caption2, "center")
-        plot.add_layout(caption3, "center")
-        plot.add_layout(caption4, "center")
-        plot.background_fill_color = None
-        plot.border_fill_color = None
-        plot.grid.grid_line_color = None
-        plot.outline_line_color = None
-        plot.yaxis.fixed_location = 0
-        plot.xaxis.fixed_location = 0
-        plot.toolbar.logo = None
-        plot.toolbar_location = None
-        print(idx)
-        export_svg(
-            plot,
-            filename=f"svgs/{idx}.svg",
-            webdriver=driver,
-            height=1600,
-            width=1600,
-        )
-        export_png(
-            plot,
-            filename=f"pngs/{idx}.png",
-            webdriver=driver,
-            height=1600,
-            width=1600,
-        )
-        # show(plot)
-
-
+        try:
+            for idx, points in pool.imap_unordered(render_chart, tasks):
+                print(idx)
+                state[str(idx)] = keys[str(idx)]
+                record(rows_in=points, rows_out=1)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            # keep what was rendered even if a chart failed
+            save_vector_chart_state(state)
+
+
+@instrument
 def export_distance_from_cluster(cluster_data):
     with open(os.path.join(OUTPUTS_DIR, "network-detail-draw.csv")) as f:
         network = list(csv.reader(f))
@@ -413,9 +626,10 @@ def export_distance_from_cluster(cluster_data):
                 cluster,
                 *vs,
                 network[int(index)][3],
-                cluster_data[int(index) - 1][6],
+                cluster_data[int(index) - 1].distance_from_cluster,
             ]
         )
+    record(rows_in=len(docs) - 1, rows_out=len(ret) - 1)
     with open(
         os.path.join(
             OUTPUTS_DIR,
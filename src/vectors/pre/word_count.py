@@ -2,35 +2,52 @@ import csv
 import os
 import sys
 
+import numpy as np
+from scipy import sparse
+
 from src.config.settings import DATA_DIR, OUTPUTS_DIR
+from src.pipelines.instrument import instrument, record
+from src.vectors.pre.keyword_counts import (
+    document_rows,
+    load_keyword_counts,
+)
 from src.vectors.pre.morphs import (
     get_cluster_data,
     get_data,
     KEYWORD_PATH,
-    get_raw_content,
 )
 
 csv.field_size_limit(sys.maxsize)
 
 
+@instrument
 def main():
-    raw_data = get_raw_content()
-    cluster = get_cluster_data()
+    cluster_data = get_cluster_data()
     morphs = get_data(KEYWORD_PATH)
+    counts = load_keyword_counts()
+    columns = {keyword: i for i, keyword in enumerate(counts.keywords)}
+    clusters = list(dict.fromkeys(c.cluster for c in cluster_data))
+    positions = {cluster: i for i, cluster in enumerate(clusters)}
+    labels = [positions[c.cluster] for c in cluster_data]
+    # clusters x documents indicator, so one product sums every cluster
+    membership = sparse.csr_matrix(
+        (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+        shape=(len(clusters), len(labels)),
+    )
+    cluster_counts = (
+        membership @ document_rows(counts, [c.index for c in cluster_data])
+    ).toarray()
     ret = {}
-    for c in cluster:
-        index, *_, cluster, _ = c
-        context = raw_data[int(index)][4]
-        if cluster not in ret:
-            ret[cluster] = {}
+    for row, cluster in enumerate(clusters):
+        ret[cluster] = {}
         for k, v in morphs.items():
-            if k not in ret[cluster]:
-                ret[cluster][k] = {}
-            for keyword in v:
-                count = context.count(keyword)
+            ret[cluster][k] = {}
+            for keyword, _ in v:
                 if keyword not in ret[cluster][k]:
                     ret[cluster][k][keyword] = 0
-                ret[cluster][k][keyword] += count
+                ret[cluster][k][keyword] += int(
+                    cluster_counts[row, columns[keyword]]
+                )
     header = ["클러스터", "미래벡터", "단어", "카운트"]
     data = [header]
 
@@ -38,6 +55,7 @@ def main():
         for v_name, keywords in values.items():
             for keyword, count in keywords.items():
                 data.append([cluster, v_name, keyword, count])
+    record(rows_in=len(cluster_data), rows_out=len(data) - 1)
     with open(
         os.path.join(OUTPUTS_DIR, "cluster-keyword-count-map.csv"), "w"
     ) as f:
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from src.vectors.pre.keyword_matcher import (
+    build_matcher,
+    count_keywords,
+    lexicon_keywords,
+)
+
+
+def assert_str_count(keywords, text):
+    counts = count_keywords(build_matcher(keywords), text)
+    for keyword in keywords:
+        assert counts[keyword] == text.count(keyword), keyword
+
+
+@pytest.mark.parametrize(
+    "keywords, text",
+    [
+        (["aa"], "aaaa"),
+        (["aa"], "aaaaa"),
+        (["aba"], "ababababa"),
+        (["미래", "미래교육", "교육"], "미래교육은 미래의 교육이다"),
+        (["학교", "교"], "학교 교실 학교교육"),
+        (["he", "she", "his", "hers"], "ushers she his hers"),
+        (["a", "aa", "aaa"], "aaaaaaa"),
+        (["abc"], ""),
+        (["없음"], "미래 학교 교육"),
+    ],
+)
+def test_matches_str_count(keywords, text):
+    assert_str_count(keywords, text)
+
+
+def test_duplicate_keywords_across_lexicons():
+    morphs = {
+        "first": [("미래", "1"), ("교육", "2")],
+        "second": [("교육", "3"), ("학교", "1")],
+        "third": ["미래", "교육"],
+    }
+    keywords = lexicon_keywords(morphs)
+    assert keywords.count("교육") == 3
+    assert_str_count(keywords, "미래 학교 교육, 교육의 미래")
+
+
+def test_empty_keyword():
+    text = "미래 교육"
+    counts = count_keywords(build_matcher(["", "교육"]), text)
+    assert counts[""] == text.count("") == len(text) + 1
+    assert counts["교육"] == 1
+
+
+def test_random_texts():
+    rng = random.Random(0)
+    for _ in range(200):
+        keywords = [
+            "".join(rng.choices("ab가", k=rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        text = "".join(rng.choices("ab가 ", k=rng.randint(0, 60)))
+        assert_str_count(keywords, text)
@@ -0,0 +1,155 @@
+import csv
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.scrapy import news_fetcher
+
+
+class StandIn:
+    """
+    A local stand-in for the search and detail endpoints.
+
+    ``total`` articles ``id0``... are paged by ``startNo``; page 2 repeats
+    ``id0``. ``flaky`` ids answer 503 that many times before succeeding,
+    ``missing`` ids always answer 404.
+    """
+
+    def __init__(self, total, flaky=None, missing=()):
+        self.total = total
+        self.flaky = Counter(flaky or {})
+        self.missing = set(missing)
+        self.details = Counter()
+        self.lock = threading.Lock()
+
+
+def make_handler(stand_in):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, body=None):
+            data = json.dumps(body).encode("utf-8") if body else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            query = json.loads(self.rfile.read(length))
+            page, size = query["startNo"], query["resultNumber"]
+            end = min(page * size, stand_in.total)
+            ids = [f"id{i}" for i in range((page - 1) * size, end)]
+            if page == 2:
+                ids.append("id0")
+            self.reply(200, {"resultList": [{"NEWS_ID": i} for i in ids]})
+
+        def do_GET(self):
+            news_id = parse_qs(urlparse(self.path).query)["docId"][0]
+            with stand_in.lock:
+                stand_in.details[news_id] += 1
+                if news_id in stand_in.missing:
+                    return self.reply(404)
+                if stand_in.flaky[news_id] > 0:
+                    stand_in.flaky[news_id] -= 1
+                    return self.reply(503)
+            detail = {
+                "NEWS_ID": news_id,
+                "DATE": "2019-03-01",
+                "TITLE": f"title {news_id}",
+                "CONTENT": "first<br/>second <b>line</b>",
+            }
+            self.reply(200, {"detail": detail})
+
+    return Handler
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setattr(news_fetcher, "RETRY_TOTAL", 2)
+    monkeypatch.setattr(news_fetcher, "RETRY_BACKOFF", 0)
+    servers = []
+
+    def start(stand_in):
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), make_handler(stand_in)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch(base_url, tmp_path, **kwargs):
+    return news_fetcher.fetch_news(
+        base_url=base_url,
+        concurrency=8,
+        rate=0,
+        page_size=100,
+        path=str(tmp_path / "news.csv"),
+        state_path=str(tmp_path / "state.json"),
+        **kwargs,
+    )
+
+
+def read_rows(tmp_path):
+    with open(tmp_path / "news.csv", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_pages_until_empty_and_retries(serve, tmp_path):
+    stand_in = StandIn(250, flaky={"id5": 1, "id120": 2})
+    state = fetch(serve(stand_in), tmp_path)
+
+    header, *rows = read_rows(tmp_path)
+    assert header == news_fetcher.HEADER
+    assert [row[0] for row in rows] == [str(i) for i in range(1, 251)]
+    assert sorted(row[2] for row in rows) == sorted(
+        f"title id{i}" for i in range(250)
+    )
+    assert rows[0][1] == "2019"
+    assert rows[0][3] == "first\nsecond line"
+    assert stand_in.details["id5"] == 2
+    assert stand_in.details["id120"] == 3
+    assert stand_in.details["id0"] == 1
+    assert state["page"] == 4
+    assert state["failed"] == []
+
+
+def test_failed_articles_are_skipped(serve, tmp_path):
+    stand_in = StandIn(150, flaky={"id8": 10}, missing={"id7"})
+    state = fetch(serve(stand_in), tmp_path)
+
+    titles = {row[2] for row in read_rows(tmp_path)[1:]}
+    assert len(titles) == 148
+    assert "title id7" not in titles and "title id8" not in titles
+    assert sorted(state["failed"]) == ["id7", "id8"]
+    assert state["page"] == 3
+
+
+def test_resumes_from_saved_state(serve, tmp_path):
+    stand_in = StandIn(250)
+    base_url = serve(stand_in)
+    state = fetch(base_url, tmp_path, max_pages=1)
+    assert state["page"] == 2
+    # A row written after the last checkpoint by an interrupted run.
+    with open(tmp_path / "news.csv", "a", encoding="utf-8") as f:
+        csv.writer(f).writerow([101, "2019", "partial", "row"])
+
+    state = fetch(base_url, tmp_path)
+
+    rows = read_rows(tmp_path)[1:]
+    assert [row[0] for row in rows] == [str(i) for i in range(1, 251)]
+    assert "partial" not in {row[2] for row in rows}
+    assert sum(stand_in.details.values()) == 250
+    assert state["page"] == 4
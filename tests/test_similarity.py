@@ -0,0 +1,115 @@
+import csv
+import random
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.pipelines import instrument
+from src.preprocessing import similarity
+
+
+def toy_corpus(n=40, seed=0):
+    rng = random.Random(seed)
+    words = [f"단어{i}" for i in range(30)]
+    return [
+        [
+            i,
+            "뉴스",
+            2000 + i % 5,
+            f"제목{i}",
+            " ".join(rng.choices(words, k=rng.randint(5, 25))),
+            i % 4,
+            0.0,
+        ]
+        for i in range(1, n + 1)
+    ]
+
+
+def baseline_similarity(docs):
+    """
+    The dense, pandas-sorted marking ``write_similarity`` used to do.
+    """
+    clusters = [str(doc[5]) for doc in docs]
+    tfidf = TfidfVectorizer().fit_transform(doc[4] for doc in docs)
+    rows = []
+    for idx, row in enumerate((tfidf * tfidf.T).toarray().tolist()):
+        df = pd.DataFrame(
+            {"index": range(len(row)), "value": row, "cluster": clusters}
+        )
+        same = (
+            df.loc[df.cluster == clusters[idx]]
+            .sort_values(by="value", ascending=False)
+            .head(5)
+        )
+        other = (
+            df.loc[df.cluster != clusters[idx]]
+            .sort_values(by="value", ascending=False)
+            .head(1)
+        )
+        top = set(same.index.tolist() + other.index.tolist())
+        rows.append(
+            [
+                str(idx + 1),
+                docs[idx][3],
+                clusters[idx],
+                *["1" if i in top else "0" for i in range(len(row))],
+            ]
+        )
+    return rows
+
+
+def write_cluster_docs(path, docs):
+    with open(path, "w", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(
+            [
+                "index",
+                "cate",
+                "year",
+                "title",
+                "context",
+                "cluster",
+                "distance_from_cluster",
+            ]
+        )
+        w.writerows(docs)
+
+
+def read_rows(path):
+    with open(path) as f:
+        return list(csv.reader(f))
+
+
+def test_matches_baseline(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity, "OUTPUTS_DIR", str(tmp_path))
+    monkeypatch.setattr(instrument, "METRICS_DIR", str(tmp_path / "metrics"))
+    docs = toy_corpus()
+    write_cluster_docs(tmp_path / "cluster-docs.csv", docs)
+
+    similarity.write_similarity(processes=2, block_size=3)
+
+    header, *rows = read_rows(tmp_path / "similarity.csv")
+    assert header == [
+        "index",
+        "title",
+        "cluster",
+        *[str(i) for i in range(1, len(docs) + 1)],
+    ]
+    assert rows == baseline_similarity(docs)
+    assert not (tmp_path / "similarity-raw.csv").exists()
+
+
+def test_raw_distances(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity, "OUTPUTS_DIR", str(tmp_path))
+    monkeypatch.setattr(instrument, "METRICS_DIR", str(tmp_path / "metrics"))
+    docs = toy_corpus(12)
+    write_cluster_docs(tmp_path / "cluster-docs.csv", docs)
+
+    similarity.write_similarity(processes=2, block_size=5, with_raw=True)
+
+    _, *rows = read_rows(tmp_path / "similarity-raw.csv")
+    tfidf = TfidfVectorizer().fit_transform(doc[4] for doc in docs)
+    expected = 1 - (tfidf * tfidf.T).toarray()
+    raw = np.array([[float(v) for v in row[3:]] for row in rows])
+    np.testing.assert_allclose(raw, expected, atol=1e-6)
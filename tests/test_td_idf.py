@@ -0,0 +1,55 @@
+from math import log
+
+import pytest
+
+from src.preprocessing.td_idf import line_term_stats
+
+
+def per_line_term_stats(noun_lines):
+    """
+    The per-word loop ``write_td_idf_by_doc`` used before the sparse matrix.
+    """
+    total_docs_count = len(noun_lines)
+    words_set = set()
+    for line in noun_lines:
+        for noun in line.split():
+            words_set.add(noun)
+    stats = {}
+    for word in words_set:
+        tf = 0
+        df = 0
+        for li in noun_lines:
+            temp_tf_count = li.split().count(word)
+            tf += temp_tf_count
+            if temp_tf_count > 0:
+                df += 1
+        idf = log(total_docs_count / (df + 1))
+        df = df / total_docs_count
+        stats[word] = (tf, df, idf)
+    return stats
+
+
+@pytest.mark.parametrize(
+    "noun_lines",
+    [
+        [],
+        ["미래"],
+        ["미래 교육", "교육 학교 교육", "학교"],
+        ["미래 미래 미래", "미래"],
+        ["교육 학교 미래 사회", "사회 변화", "변화 변화 교육", "기술 미래"],
+        [" ".join(f"단어{i % 7}" for i in range(n)) for n in range(1, 40)],
+    ],
+)
+def test_matches_per_line_loop(noun_lines):
+    words, tf, df, idf = line_term_stats(noun_lines)
+    assert len(words) == len(set(words))
+    stats = {
+        word: (t, d, i) for word, t, d, i in zip(words, tf, df, idf)
+    }
+    assert stats == per_line_term_stats(noun_lines)
+    assert all(type(t) is int for t in tf)
+
+
+def test_words_in_first_seen_order():
+    words, *_ = line_term_stats(["학교 미래", "교육 미래", "학교"])
+    assert words == ["학교", "미래", "교육"]